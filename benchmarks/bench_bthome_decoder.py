@@ -0,0 +1,312 @@
+"""
+BTHome payload decoder benchmark and fuzz comparison for bthome_bleak.
+
+Feeds the same fuzzed advertisement sequence to the precompiled decoder
+table of BTHomeBaseScanner and to the original two-pass parser, both with
+the shipped MEAS_TYPES and with a table covering every data format, and
+checks the results and packet-id filtering are identical. Then reports the
+cost per advertisement.
+
+Run from the repository root: `python -m benchmarks.bench_bthome_decoder`
+"""
+
+import argparse
+import logging
+import os
+import random
+import struct
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+os.environ.setdefault("QUESTDB_USER", "bench")
+os.environ.setdefault("QUESTDB_PASSWORD", "bench")
+
+from camper_api.plugins.bthome_bleak import (  # noqa: E402
+    BTHomeBaseScanner,
+    build_decoders,
+)
+from camper_api.plugins.bthome_const import MEAS_TYPES, MeasTypes  # noqa: E402
+
+logger = logging.getLogger("uvicorn.camper-api.bthome_ble")
+
+ADDRESS = "7C:C6:B6:61:E5:68"
+
+ALL_FORMATS: dict[int, MeasTypes] = {
+    **MEAS_TYPES,
+    0x02: MeasTypes("temperature_fine", "°C", 2, "signed_integer", 0.01),
+    0x04: MeasTypes("pressure", "hPa", 3, "unsigned_integer", 0.01),
+    0x0C: MeasTypes("voltage", "V", 2, 0, 0.001),
+    0x3E: MeasTypes("count", None, 4, "unsigned_integer"),
+    0x50: MeasTypes("timestamp", None, 4, "timestamp"),
+    0x53: MeasTypes("text", None, 0, "string"),
+    0x54: MeasTypes("raw", None, 0, "raw"),
+    0x60: MeasTypes("float_half", None, 2, "float", 0.5),
+    0x61: MeasTypes("float_single", None, 4, 2),
+    0x62: MeasTypes("float_bad", None, 3, "float"),
+}
+
+
+# The original value parsers, replaced in bthome_bleak by build_decoders.
+def parse_uint(data_obj: bytes, factor: float = 1.0) -> float:
+    """Convert bytes (as unsigned integer) and factor to float."""
+    decimal_places = -int(f"{factor:e}".split("e")[-1])
+    return round(
+        int.from_bytes(data_obj, "little", signed=False) * factor, decimal_places
+    )
+
+
+def parse_int(data_obj: bytes, factor: float = 1.0) -> float:
+    """Convert bytes (as signed integer) and factor to float."""
+    decimal_places = -int(f"{factor:e}".split("e")[-1])
+    return round(
+        int.from_bytes(data_obj, "little", signed=True) * factor, decimal_places
+    )
+
+
+def parse_float(data_obj: bytes, factor: float = 1.0) -> float | None:
+    """Convert bytes (as float) and factor to float."""
+    decimal_places = -int(f"{factor:e}".split("e")[-1])
+    if len(data_obj) == 2:
+        [val] = struct.unpack("e", data_obj)
+    elif len(data_obj) == 4:
+        [val] = struct.unpack("f", data_obj)
+    elif len(data_obj) == 8:
+        [val] = struct.unpack("d", data_obj)
+    else:
+        logger.error("only 2, 4 or 8 byte long floats are supported in BTHome BLE")
+        return None
+    return round(val * factor, decimal_places)
+
+
+def parse_raw(data_obj: bytes) -> str | None:
+    """Convert bytes to raw hex string."""
+    return data_obj.hex()
+
+
+def parse_string(data_obj: bytes) -> str | None:
+    """Convert bytes to string."""
+    try:
+        return data_obj.decode("UTF-8")
+    except UnicodeDecodeError:
+        logger.error(
+            "BTHome data contains bytes that can't be decoded to a string (use UTF-8 encoding)"
+        )
+        return None
+
+
+def parse_timestamp(data_obj: bytes) -> datetime:
+    """Convert bytes to a datetime object."""
+    value = datetime.fromtimestamp(
+        int.from_bytes(data_obj, "little", signed=False), tz=timezone.utc
+    )
+    return value
+
+
+class ReferenceParser(BTHomeBaseScanner):
+    """The original parser: collect objects as dicts, then dispatch on format."""
+
+    def __init__(self, meas_types: dict[int, MeasTypes]):
+        super().__init__([ADDRESS])
+        self.meas_types = meas_types
+
+    def _parse_payload(self, payload: bytes, adv_time: float, address: str):
+        meas_types = self.meas_types
+        device = self._device(address)
+        payload_length = len(payload)
+        next_obj_start = 0
+        prev_obj_meas_type = 0
+        measurements: list[dict[str, Any]] = []
+
+        while payload_length >= next_obj_start + 1:
+            obj_start = next_obj_start
+            obj_meas_type = payload[obj_start]
+            if obj_meas_type not in meas_types:
+                break
+            prev_obj_meas_type = obj_meas_type
+            obj_data_format = meas_types[obj_meas_type].data_format
+
+            if obj_data_format in ["raw", "string"]:
+                obj_data_length = payload[obj_start + 1]
+                obj_data_start = obj_start + 2
+            else:
+                obj_data_length = meas_types[obj_meas_type].data_length
+                obj_data_start = obj_start + 1
+            next_obj_start = obj_data_start + obj_data_length
+
+            if obj_data_length == 0:
+                continue
+            if payload_length < next_obj_start:
+                break
+
+            if obj_meas_type == 0:
+                new_packet_id = parse_uint(payload[obj_data_start:next_obj_start])
+                if self._skip_old_or_duplicated_advertisement(
+                    device, new_packet_id, adv_time
+                ):
+                    break
+                device.last_packet_id = new_packet_id
+                device.last_adv_time = adv_time
+
+            measurements.append(
+                {
+                    "data format": obj_data_format,
+                    "measurement type": obj_meas_type,
+                    "measurement data": payload[obj_data_start:next_obj_start],
+                }
+            )
+
+        meas_results = {}
+        for meas in measurements:
+            meas_type = meas_types[meas["measurement type"]]
+            meas_factor = meas_type.factor
+            data_format = meas["data format"]
+            data = meas["measurement data"]
+            if data_format == 0 or data_format == "unsigned_integer":
+                value = parse_uint(data, meas_factor)
+            elif data_format == 1 or data_format == "signed_integer":
+                value = parse_int(data, meas_factor)
+            elif data_format == 2 or data_format == "float":
+                value = parse_float(data, meas_factor)
+            elif data_format == 3 or data_format == "string":
+                value = parse_string(data)
+            elif data_format == 4 or data_format == "raw":
+                value = parse_raw(data)
+            elif data_format == 5 or data_format == "timestamp":
+                value = parse_timestamp(data)
+            else:
+                continue
+
+            if value is not None:
+                if address not in meas_results:
+                    meas_results[address] = {}
+                meas_results[address][meas_type.state_name] = {
+                    "unit": str(meas_type.unit),
+                    "value": value,
+                    "state_name": meas_type.state_name,
+                }
+
+        return meas_results
+
+
+def encode_object(rng: random.Random, object_id: int, meas_type: MeasTypes) -> bytes:
+    data_format = meas_type.data_format
+    if data_format in ("string", "raw"):
+        if data_format == "string" and rng.random() < 0.8:
+            data = "".join(rng.choice("abcé°xyz") for _ in range(rng.randrange(8)))
+            data = data.encode()
+        else:
+            data = bytes(rng.randrange(256) for _ in range(rng.randrange(8)))
+        return bytes([object_id, len(data)]) + data
+    if data_format in ("timestamp", 5):
+        data = struct.pack("<I", rng.randrange(2**31))
+    else:
+        data = bytes(rng.randrange(256) for _ in range(meas_type.data_length))
+    return bytes([object_id]) + data
+
+
+def advert(rng: random.Random, meas_types: dict[int, MeasTypes], packet_id: int):
+    """A payload of ascending objects, sometimes damaged."""
+    ids = sorted(rng.sample(sorted(meas_types), rng.randrange(1, len(meas_types))))
+    if rng.random() < 0.9:
+        ids = [0] + [i for i in ids if i != 0]
+    out = bytearray()
+    for object_id in ids:
+        if object_id == 0:
+            out += bytes([0, packet_id & 0xFF])
+        else:
+            out += encode_object(rng, object_id, meas_types[object_id])
+
+    kind = rng.random()
+    if kind < 0.05:
+        out = out[: rng.randrange(len(out) + 1)]
+    elif kind < 0.1:
+        out += bytes([rng.randrange(256)])
+    elif kind < 0.15 and out:
+        out[rng.randrange(len(out))] = rng.randrange(256)
+    return bytes(out)
+
+
+def corpus(seed: int, meas_types: dict[int, MeasTypes], count: int):
+    """(payload, adv_time) pairs with repeated, stale and late packet ids."""
+    rng = random.Random(seed)
+    packet_id, adv_time, out = 0, 0.0, []
+    for _ in range(count):
+        step = rng.random()
+        if step < 0.7:
+            packet_id += 1
+        elif step < 0.8:
+            packet_id -= rng.randrange(1, 5)
+        elif step < 0.9:
+            packet_id += rng.randrange(60, 200)
+        adv_time += rng.choice((0.5, 1.0, 5.0))
+        out.append((advert(rng, meas_types, packet_id), adv_time))
+    return out
+
+
+def run(parser: BTHomeBaseScanner, items) -> list:
+    out = []
+    for payload, t in items:
+        try:
+            out.append(parser._parse_payload(payload, t, ADDRESS))
+        except IndexError:
+            # a length byte missing at the end of the payload
+            out.append("IndexError")
+    return out
+
+
+def check(seeds: int, count: int) -> None:
+    for meas_types in (MEAS_TYPES, ALL_FORMATS):
+        for seed in range(seeds):
+            items = corpus(seed, meas_types, count)
+            parser = BTHomeBaseScanner([ADDRESS])
+            parser.decoders = build_decoders(meas_types)
+            expect = run(ReferenceParser(meas_types), items)
+            got = run(parser, items)
+            # repr() so NaN floats compare equal
+            assert repr(got) == repr(expect), f"mismatch for seed {seed}"
+    print(f"{seeds} fuzzed corpora x {count} adverts identical for both tables")
+
+
+def per_advert(parser: BTHomeBaseScanner, items, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        parser.devices.clear()
+        started = time.perf_counter()
+        for payload, t in items:
+            parser._parse_payload(payload, t, ADDRESS)
+        best = min(best, time.perf_counter() - started)
+    return best / len(items)
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--seeds", type=int, default=20)
+    arg_parser.add_argument("--adverts", type=int, default=20000)
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    args = arg_parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    check(args.seeds, 500)
+
+    # Typical inside/outside sensor advert: packet id, battery, humidity, temp
+    items = [
+        (
+            struct.pack(
+                "<BBBBBBBh", 0, i & 0xFF, 0x01, 90, 0x2E, 55, 0x45, 215 + i % 7
+            ),
+            float(i),
+        )
+        for i in range(args.adverts)
+    ]
+    for name, parser in (
+        ("reference", ReferenceParser(MEAS_TYPES)),
+        ("decoders", BTHomeBaseScanner([ADDRESS])),
+    ):
+        print(
+            f"{name:>10}: {per_advert(parser, items, args.repeat) * 1e6:6.2f} µs/advert"
+        )
+
+
+if __name__ == "__main__":
+    main()
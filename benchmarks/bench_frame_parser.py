@@ -0,0 +1,189 @@
+"""
+Frame parser benchmark and fuzz comparison for hymer_serial.
+
+Compares FrameParser and crc16_mcrf4xx against the original bit-by-bit,
+byte-by-byte reference on the CRC self-check vectors and fuzzed streams,
+then reports parser throughput in bytes per second.
+
+Run from the repository root: `python -m benchmarks.bench_frame_parser`
+"""
+
+import argparse
+import os
+import random
+import struct
+import time
+
+os.environ.setdefault("QUESTDB_USER", "bench")
+os.environ.setdefault("QUESTDB_PASSWORD", "bench")
+
+from camper_api.plugins.hymer_serial import (  # noqa: E402
+    MAX_PAYLOAD,
+    OP_ACK,
+    OP_TELEMETRY_PUSH,
+    SOF,
+    Frame,
+    FrameParser,
+    _self_check_crc,
+    build_frame,
+    crc16_mcrf4xx,
+)
+
+
+def reference_crc16_mcrf4xx(data: bytes) -> int:
+    crc = 0xFFFF
+    for b in data:
+        crc ^= b
+        for _ in range(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0x8408
+            else:
+                crc >>= 1
+    return crc & 0xFFFF
+
+
+class ReferenceFrameParser:
+    """The original byte-by-byte state machine."""
+
+    IDLE, GOT_SOF, GOT_OP, IN_PAYLOAD, GOT_CRC_LO, GOT_CRC_HI = range(6)
+
+    def __init__(self) -> None:
+        self.state = self.IDLE
+        self.opcode = 0
+        self.length = 0
+        self.payload = bytearray()
+        self.crc_lo = 0
+
+    def feed_stream(self, data: bytes) -> list[Frame]:
+        out: list[Frame] = []
+        for b in data:
+            if self.state == self.IDLE:
+                if b == SOF:
+                    self.state = self.GOT_SOF
+                    self.payload.clear()
+                continue
+            if self.state == self.GOT_SOF:
+                self.opcode = b
+                self.state = self.GOT_OP
+                continue
+            if self.state == self.GOT_OP:
+                if b > MAX_PAYLOAD:
+                    self.state = self.IDLE
+                    continue
+                self.length = b
+                self.state = self.IN_PAYLOAD if b else self.GOT_CRC_LO
+                continue
+            if self.state == self.IN_PAYLOAD:
+                self.payload.append(b)
+                if len(self.payload) >= self.length:
+                    self.state = self.GOT_CRC_LO
+                continue
+            if self.state == self.GOT_CRC_LO:
+                self.crc_lo = b
+                self.state = self.GOT_CRC_HI
+                continue
+            if self.state == self.GOT_CRC_HI:
+                received = self.crc_lo | (b << 8)
+                body = bytes([self.opcode, self.length]) + bytes(self.payload)
+                if received == reference_crc16_mcrf4xx(body):
+                    out.append(Frame(self.opcode, bytes(self.payload)))
+                self.state = self.IDLE
+        return out
+
+
+def telemetry_frame(rng: random.Random) -> bytes:
+    payload = struct.pack(
+        "<HHHBBBH",
+        rng.randrange(11000, 14500),
+        rng.randrange(0, 240000) // 1000,
+        rng.randrange(11000, 14500),
+        rng.randrange(0, 101),
+        rng.randrange(0, 101),
+        rng.randrange(0, 8),
+        rng.randrange(0, 0x800),
+    )
+    return build_frame(OP_TELEMETRY_PUSH, payload)
+
+
+def fuzz_stream(rng: random.Random, frames: int) -> bytes:
+    """Valid frames mixed with noise, truncation, bad lengths and bit flips."""
+    out = bytearray()
+    for _ in range(frames):
+        kind = rng.random()
+        if kind < 0.6:
+            out += telemetry_frame(rng)
+        elif kind < 0.7:
+            out += build_frame(OP_ACK, bytes(rng.randrange(256) for _ in range(3)))
+        elif kind < 0.8:
+            frame = bytearray(telemetry_frame(rng))
+            frame[rng.randrange(len(frame))] ^= 1 << rng.randrange(8)
+            out += frame
+        elif kind < 0.85:
+            out += telemetry_frame(rng)[: rng.randrange(1, 10)]
+        elif kind < 0.9:
+            out += bytes([SOF, rng.randrange(256), rng.randrange(MAX_PAYLOAD + 1, 256)])
+        else:
+            out += bytes(rng.choice((SOF, rng.randrange(256))) for _ in range(8))
+    return bytes(out)
+
+
+def feed_chunked(parser, stream: bytes, rng: random.Random) -> list[Frame]:
+    frames = []
+    pos = 0
+    while pos < len(stream):
+        size = rng.randrange(1, 65)
+        frames += parser.feed_stream(stream[pos : pos + size])
+        pos += size
+    return frames
+
+
+def check(seeds: int) -> None:
+    _self_check_crc()
+    rng = random.Random(0)
+    for _ in range(1000):
+        data = bytes(rng.randrange(256) for _ in range(rng.randrange(64)))
+        assert crc16_mcrf4xx(data) == reference_crc16_mcrf4xx(data), data.hex()
+
+    for seed in range(seeds):
+        stream = fuzz_stream(random.Random(seed), 500)
+        expect = feed_chunked(ReferenceFrameParser(), stream, random.Random(seed))
+        got = feed_chunked(FrameParser(), stream, random.Random(seed))
+        assert got == expect, f"frame mismatch for seed {seed}"
+    print(f"CRC vectors and {seeds} fuzzed streams identical")
+
+
+def throughput(parser_cls, stream: bytes, chunk: int, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        parser = parser_cls()
+        started = time.perf_counter()
+        for pos in range(0, len(stream), chunk):
+            parser.feed_stream(stream[pos : pos + chunk])
+        best = min(best, time.perf_counter() - started)
+    return len(stream) / best
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--seeds", type=int, default=50)
+    arg_parser.add_argument("--frames", type=int, default=20000)
+    arg_parser.add_argument("--chunk", type=int, default=64)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    check(args.seeds)
+
+    rng = random.Random(1)
+    stream = b"".join(telemetry_frame(rng) for _ in range(args.frames))
+    for name, parser_cls in (
+        ("reference", ReferenceFrameParser),
+        ("FrameParser", FrameParser),
+    ):
+        rate = throughput(parser_cls, stream, args.chunk, args.repeat)
+        print(
+            f"{name:>12}: {rate / 1e6:6.2f} MB/s ({rate * 8 / 115200:7.1f}x 115200 baud)"
+        )
+
+
+if __name__ == "__main__":
+    main()
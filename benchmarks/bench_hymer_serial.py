@@ -0,0 +1,125 @@
+"""
+HymerSerial benchmark against the pty firmware simulator.
+
+Measures action round-trip latency (sequential and concurrent) and the
+highest telemetry push rate the API ingests without losing frames.
+
+Run from the repository root: `python -m benchmarks.bench_hymer_serial`
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+# HymerSerial reads its port and database from settings at import time.
+os.environ.setdefault("QUESTDB_USER", "benchmark")
+os.environ.setdefault("QUESTDB_PASSWORD", "benchmark")
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URL",
+    f"sqlite:///{tempfile.mkdtemp(prefix='camper-bench-')}/storage.db",
+)
+
+from camper_api import models  # noqa: E402
+from camper_api.config import settings  # noqa: E402
+from camper_api.database import engine  # noqa: E402
+from camper_api.memory_cache import MemoryCache  # noqa: E402
+from camper_api.plugins.hymer_serial import HymerSerial, OP_SUBSCRIBE  # noqa: E402
+from camper_api.plugins.hymer_simulator import HymerSimulator  # noqa: E402
+
+
+def percentiles(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": 1000 * ordered[len(ordered) // 2],
+        "p95_ms": 1000 * ordered[int(len(ordered) * 0.95)],
+        "max_ms": 1000 * ordered[-1],
+        "mean_ms": 1000 * statistics.fmean(ordered),
+    }
+
+
+async def round_trips(hymer: HymerSerial, count: int, concurrency: int) -> dict:
+    latencies = []
+
+    async def worker(n: int):
+        for i in range(n):
+            started = time.perf_counter()
+            await hymer.pump(i % 2)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(worker(count // concurrency) for _ in range(concurrency)))
+    return percentiles(latencies)
+
+
+async def telemetry_rate(
+    hymer: HymerSerial, simulator: HymerSimulator, rate: float, duration: float
+) -> dict:
+    simulator.set_push_interval(1 / rate)
+    await hymer._request(OP_SUBSCRIBE, bytes([0]))
+    await asyncio.sleep(0.2)
+
+    sent, received = simulator.telemetry_sent, hymer.frames_received
+    started = time.perf_counter()
+    await asyncio.sleep(duration)
+    # Let in-flight frames drain before counting.
+    await asyncio.sleep(0.2)
+    elapsed = time.perf_counter() - started - 0.2
+
+    sent = simulator.telemetry_sent - sent
+    received = hymer.frames_received - received
+    return {
+        "target_rate": rate,
+        "sent_per_s": sent / elapsed,
+        "received_per_s": received / elapsed,
+        "loss": 1 - received / sent if sent else 0.0,
+    }
+
+
+async def run(args) -> None:
+    simulator = HymerSimulator(
+        latency=args.latency, subscribe_ttl=3600, idle_interval=3600, seed=0
+    )
+    await simulator.start()
+    settings.hymer_serial_port = simulator.port
+
+    models.Base.metadata.create_all(bind=engine)
+    MemoryCache.init()
+    hymer = HymerSerial()
+    await hymer.start()
+
+    try:
+        for concurrency in (1, 4):
+            result = await round_trips(hymer, args.round_trips, concurrency)
+            print(
+                f"round trip x{concurrency}: "
+                + ", ".join(f"{k}={v:.2f}" for k, v in result.items())
+            )
+
+        sustainable = 0.0
+        for rate in args.rates:
+            result = await telemetry_rate(hymer, simulator, rate, args.duration)
+            print(
+                f"telemetry {rate:6.0f}/s: sent {result['sent_per_s']:7.1f}/s, "
+                f"received {result['received_per_s']:7.1f}/s, "
+                f"loss {100 * result['loss']:.1f}%"
+            )
+            if result["loss"] > 0.01:
+                break
+            sustainable = result["received_per_s"]
+        print(f"max sustainable telemetry rate: {sustainable:.1f} frames/s")
+    finally:
+        await hymer.stop()
+        await simulator.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--latency", type=float, default=0.002)
+    parser.add_argument("--round-trips", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=3.0)
+    parser.add_argument(
+        "--rates", type=float, nargs="+", default=[10, 50, 100, 250, 500, 1000]
+    )
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,509 @@
+"""
+Benchmark suite over a synthetic multi-week dataset.
+
+Generates a SQLite database with every sensor and entity from the settings,
+one state per entity every storage interval for `--days` days, as the
+samplers leave behind in production. On that dataset it times state
+ingestion, paging, grouped reads per period, the sensor states endpoint,
+deleting old states and a QuestDB backlog upload to a local stand-in
+server. Results are written as JSON; pass an earlier result file with
+`--compare` to print the change per measurement.
+
+The dataset is generated from `--seed`, so runs with the same arguments
+measure the same data. Set SQLALCHEMY_DATABASE_URL to keep the database.
+
+Run from the repository root:
+`python -m benchmarks.bench_suite --days 14 --output results.json`
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("QUESTDB_USER", "benchmark")
+os.environ.setdefault("QUESTDB_PASSWORD", "benchmark")
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URL",
+    f"sqlite:///{tempfile.mkdtemp(prefix='camper-suite-')}/storage.db",
+)
+
+from aiohttp import web  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from camper_api import crud, models, schemas  # noqa: E402
+from camper_api.config import settings  # noqa: E402
+from camper_api.database import SessionLocal, engine  # noqa: E402
+from camper_api.grouped_states import grouped_states_cache, read_grouped_data  # noqa
+from camper_api.main import DeleteOldStates, app  # noqa: E402
+from camper_api.memory_cache import MemoryCache  # noqa: E402
+from camper_api.plugins import questdb_uploader  # noqa: E402
+
+# name: (low, high, decimals) of numeric entities, following a daily cycle
+NUMERIC_RANGES = {
+    "voltage": (12.2, 14.4, 2),
+    "current": (-15.0, 20.0, 2),
+    "remaining_mins": (0, 14400, 0),
+    "soc": (40.0, 100.0, 1),
+    "consumed_ah": (-120.0, 0.0, 1),
+    "battery_charging_current": (0.0, 20.0, 1),
+    "battery_voltage": (12.2, 14.4, 2),
+    "solar_power": (0, 300, 0),
+    "yield_today": (0, 1500, 0),
+    "battery": (60, 100, 0),
+    "temperature": (5.0, 30.0, 2),
+    "humidity": (30.0, 90.0, 1),
+    "household_voltage": (12.2, 14.4, 2),
+    "starter_voltage": (12.0, 12.8, 2),
+    "mains_voltage": (0, 230, 0),
+    "water_state": (0, 100, 0),
+    "waste_state": (0, 100, 0),
+    "errors": (0, 0, 0),
+}
+# name: states of entities switching now and then
+STRING_STATES = {
+    "charge_state": ["OFF", "BULK", "ABSORPTION", "FLOAT"],
+    "household_state": ["0", "1"],
+    "pump_state": ["0", "1"],
+}
+GROUPED_PERIODS = [("5min", 288), ("1h", 168), ("4h", 100), ("1D", 30)]
+INSERT_CHUNK = 5000
+
+
+def configured_sensors() -> dict[str, tuple[schemas.SensorCreate, list[str]]]:
+    sensors = {
+        name: (
+            schemas.SensorCreate(
+                name=name, address=device["address"], key=device["key"]
+            ),
+            settings.victron_entities.get(name, []),
+        )
+        for name, device in settings.victron_sensors.items()
+    }
+    for name, address in settings.bthome_sensors.items():
+        sensors[name] = (
+            schemas.SensorCreate(name=name, address=address),
+            settings.bthome_entities.get(name, []),
+        )
+    sensors[settings.hymer_sensor] = (
+        schemas.SensorCreate(name=settings.hymer_sensor),
+        settings.hymer_entities,
+    )
+    return sensors
+
+
+class EntitySeries:
+    """Seeded values of one entity: a daily cycle with noise, or rare switches."""
+
+    def __init__(self, name: str, rng: random.Random):
+        self.rng = rng
+        self.states = STRING_STATES.get(name)
+        self.low, self.high, self.decimals = NUMERIC_RANGES.get(name, (0.0, 100.0, 1))
+        self.phase = rng.random() * 2 * math.pi
+        self.state = rng.choice(self.states) if self.states else None
+
+    def value(self, stamp: datetime) -> str:
+        if self.states:
+            if self.rng.random() < 0.02:
+                self.state = self.rng.choice(self.states)
+            return self.state
+
+        day = (stamp.hour * 3600 + stamp.minute * 60 + stamp.second) / 86400
+        level = 0.5 + 0.4 * math.sin(2 * math.pi * day + self.phase)
+        level += 0.1 * (self.rng.random() - 0.5)
+        value = self.low + (self.high - self.low) * min(max(level, 0.0), 1.0)
+        if self.decimals == 0:
+            return str(int(round(value)))
+        return str(round(value, self.decimals))
+
+
+def generate(days: int, seed: int) -> tuple[dict, dict]:
+    """Recreate the database; returns the provisioned sensors and statistics."""
+    started = time.perf_counter()
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+
+    with SessionLocal() as db:
+        sensors = crud.provision_sensors(db, configured_sensors())
+
+    rng = random.Random(seed)
+    step = timedelta(minutes=settings.state_storage_interval)
+    end = datetime.now().replace(microsecond=0)
+    samples = int(timedelta(days=days) / step)
+    series = {
+        entity_id: EntitySeries(name, rng)
+        for sensor in sensors.values()
+        for name, entity_id in sensor.entities.items()
+    }
+
+    rows, total = [], 0
+    with engine.begin() as conn:
+        for i in range(samples, 0, -1):
+            tick = end - i * step
+            for entity_id, entity in series.items():
+                stamp = tick + timedelta(seconds=rng.randrange(60))
+                rows.append(
+                    {
+                        "entity_id": entity_id,
+                        "state": entity.value(stamp),
+                        "created": stamp,
+                    }
+                )
+            if len(rows) >= INSERT_CHUNK:
+                conn.execute(models.State.__table__.insert(), rows)
+                total += len(rows)
+                rows = []
+        if rows:
+            conn.execute(models.State.__table__.insert(), rows)
+            total += len(rows)
+
+    return sensors, {
+        "days": days,
+        "seed": seed,
+        "sensors": len(sensors),
+        "entities": len(series),
+        "rows": total,
+        "generate_s": round(time.perf_counter() - started, 3),
+    }
+
+
+def summarize(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "runs": len(ordered),
+        "min_ms": round(1000 * ordered[0], 3),
+        "median_ms": round(1000 * statistics.median(ordered), 3),
+        "max_ms": round(1000 * ordered[-1], 3),
+    }
+
+
+async def bench_create_state(entity_ids: list[int], rounds: int) -> dict:
+    """Cache-only updates and storage-interval writes, single and batched."""
+    MemoryCache.init()
+    store = MemoryCache.get_backend()._store
+    results = {}
+
+    with SessionLocal() as db:
+        stored = []
+        for i in range(rounds):
+            store.clear()
+            for entity_id in entity_ids:
+                started = time.perf_counter()
+                await crud.create_state(db, entity_id, str(i))
+                stored.append(time.perf_counter() - started)
+        results["create_state_stored"] = summarize(stored)
+
+        cached = []
+        for i in range(rounds):
+            for entity_id in entity_ids:
+                started = time.perf_counter()
+                await crud.create_state(db, entity_id, str(i))
+                cached.append(time.perf_counter() - started)
+        results["create_state_cached"] = summarize(cached)
+
+        batches = []
+        for i in range(rounds):
+            store.clear()
+            started = time.perf_counter()
+            await crud.create_states(
+                db, {entity_id: str(i) for entity_id in entity_ids}
+            )
+            batches.append(time.perf_counter() - started)
+        results["create_states_stored_batch"] = summarize(batches)
+
+    return results
+
+
+def bench_get_states(entity_id: int, limit: int) -> dict:
+    """Page through the full history of one entity with skip/limit."""
+    pages = []
+    with SessionLocal() as db:
+        skip = 0
+        while True:
+            started = time.perf_counter()
+            states = crud.get_states(db, entity_id, skip=skip, limit=limit)
+            pages.append(time.perf_counter() - started)
+            if len(states) < limit:
+                break
+            skip += limit
+
+    return {
+        "limit": limit,
+        "pages": len(pages),
+        "total_s": round(sum(pages), 3),
+        "first_page_ms": round(1000 * pages[0], 3),
+        "last_page_ms": round(1000 * pages[-1], 3),
+        **summarize(pages),
+    }
+
+
+def bench_grouped(entity_id: int, intervals: bool, repeat: int) -> dict:
+    """Cold (empty bucket cache) and warm reads for each period."""
+    results = {}
+    with SessionLocal() as db:
+        for period, samples in GROUPED_PERIODS:
+            cold, warm = [], []
+            for _ in range(repeat):
+                grouped_states_cache.clear()
+                started = time.perf_counter()
+                read_grouped_data(db, entity_id, period, samples, intervals)
+                cold.append(time.perf_counter() - started)
+
+                started = time.perf_counter()
+                read_grouped_data(db, entity_id, period, samples, intervals)
+                warm.append(time.perf_counter() - started)
+            results[f"{period}x{samples}"] = {
+                "cold": summarize(cold),
+                "warm": summarize(warm),
+            }
+    return results
+
+
+def bench_sensor_states(sensor_names: list[str], repeat: int) -> dict:
+    """`/sensors/{name}/states/` answered from the cache and from the database."""
+    # Without entering the client the lifespan, and so the plugins, stays off.
+    client = TestClient(app)
+    store = MemoryCache.get_backend()._store
+    results = {}
+    for name in sensor_names:
+        warm, cold = [], []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            response = client.get(f"/sensors/{name}/states/")
+            warm.append(time.perf_counter() - started)
+            response.raise_for_status()
+
+            saved = dict(store)
+            store.clear()
+            started = time.perf_counter()
+            response = client.get(f"/sensors/{name}/states/")
+            cold.append(time.perf_counter() - started)
+            response.raise_for_status()
+            store.update(saved)
+        results[name] = {"cache": summarize(warm), "database": summarize(cold)}
+    return results
+
+
+class QuestDbStandIn:
+    """
+    Local server answering the uploader like QuestDB does: `/exec` for the
+    REST protocol and ILP over HTTP on `/write`. Rows are counted, not kept.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.requests = 0
+        self.port = None
+        self._loop = asyncio.new_event_loop()
+        self._runner = None
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="questdb-stand-in", daemon=True
+        )
+
+    async def _exec(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        if request.query.get("query", "").startswith("INSERT"):
+            self.rows += 1
+            return web.json_response({"dml": "OK"})
+        return web.json_response({"dataset": [[self.rows, None]]})
+
+    async def _write(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        self.rows += (await request.read()).count(b"\n")
+        return web.Response(status=204)
+
+    async def _start(self) -> None:
+        server = web.Application()
+        server.router.add_get("/exec", self._exec)
+        server.router.add_post("/write", self._write)
+        self._runner = web.AppRunner(server, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.port = self._runner.addresses[0][1]
+
+    def start(self) -> None:
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+
+    def stop(self) -> None:
+        asyncio.run_coroutine_threadsafe(self._runner.cleanup(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+async def bench_questdb_upload(hours: float, protocol: str | None) -> dict:
+    """One upload() of the states stored in the last `hours`."""
+    if protocol:
+        questdb_uploader.PROTOCOL = protocol
+
+    stand_in = QuestDbStandIn()
+    stand_in.start()
+    settings.questdb_configs = [{"host": "127.0.0.1", "port": str(stand_in.port)}]
+    try:
+        uploader = questdb_uploader.QuestDbUploader()
+        await uploader.set_last_upload(datetime.now() - timedelta(hours=hours))
+        started = time.perf_counter()
+        await uploader.upload()
+        elapsed = time.perf_counter() - started
+    finally:
+        stand_in.stop()
+
+    return {
+        "protocol": questdb_uploader.PROTOCOL,
+        "hours": hours,
+        "rows": stand_in.rows,
+        "requests": stand_in.requests,
+        "seconds": round(elapsed, 3),
+        "rows_per_s": round(stand_in.rows / elapsed, 1),
+    }
+
+
+async def bench_delete_old_states(days: int) -> dict:
+    """One DeleteOldStates run removing the oldest day of the dataset."""
+    settings.state_delete_after_days = days - 1
+    job = DeleteOldStates()
+    before = job._db.query(models.State).count()
+    started = time.perf_counter()
+    await job.run()
+    elapsed = time.perf_counter() - started
+    deleted = before - job._db.query(models.State).count()
+    job._db.close()
+    return {
+        "rows_before": before,
+        "rows_deleted": deleted,
+        "seconds": round(elapsed, 3),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results: dict, prefix: str = "") -> dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+
+def compare(previous: dict, current: dict) -> None:
+    """Print timings and rates present in both result files side by side."""
+    old, new = flatten(previous["results"]), flatten(current["results"])
+    print(
+        f"\nCompared with {previous['meta'].get('commit')} "
+        f"({previous['meta'].get('started')}):"
+    )
+    for field in ("days", "seed", "rows"):
+        if previous["meta"].get(field) != current["meta"].get(field):
+            print(
+                f"  Different dataset: {field} {previous['meta'].get(field)} "
+                f"-> {current['meta'].get(field)}"
+            )
+    for key, value in new.items():
+        if key not in old or not key.endswith(("_ms", "_s", "seconds")):
+            continue
+        change = (value / old[key] - 1) * 100 if old[key] else float("inf")
+        print(f"  {key:<60} {old[key]:>12.3f} -> {value:>12.3f}  {change:+7.1f}%")
+
+
+async def run(args) -> dict:
+    meta = {
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": settings.sqlalchemy_database_url,
+    }
+    print(f"Generating {args.days} days of states ...")
+    sensors, dataset = generate(args.days, args.seed)
+    meta.update(dataset)
+    print(
+        f"  {dataset['rows']} states of {dataset['entities']} entities "
+        f"in {dataset['generate_s']}s"
+    )
+
+    entity_ids = [i for sensor in sensors.values() for i in sensor.entities.values()]
+    shunt = sensors["SmartShunt"].entities
+    solar = sensors["SmartSolar"].entities
+    results = {}
+
+    print("get_states paging ...")
+    results["get_states_pages"] = bench_get_states(shunt["voltage"], args.page_size)
+
+    print("read_grouped_data ...")
+    results["grouped_numeric"] = bench_grouped(shunt["voltage"], False, args.repeat)
+    results["grouped_intervals"] = bench_grouped(
+        solar["charge_state"], True, args.repeat
+    )
+
+    print("create_state ...")
+    results.update(await bench_create_state(entity_ids, args.repeat))
+
+    print("/sensors/{name}/states/ ...")
+    results["sensor_states"] = bench_sensor_states(list(sensors), args.repeat)
+
+    print("QuestDB upload ...")
+    results["questdb_upload"] = await bench_questdb_upload(
+        args.upload_hours, args.questdb_protocol
+    )
+
+    print("DeleteOldStates ...")
+    results["delete_old_states"] = await bench_delete_old_states(args.days)
+
+    return {"meta": meta, "results": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--days", type=int, default=14, help="days of history (7-30)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=10, help="runs per timing")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument(
+        "--upload-hours", type=float, default=6.0, help="QuestDB backlog to upload"
+    )
+    parser.add_argument(
+        "--questdb-protocol",
+        choices=["ilp", "rest"],
+        help="default: ilp when the questdb client is installed",
+    )
+    parser.add_argument("--output", default="bench_suite.json")
+    parser.add_argument("--compare", help="earlier result file to compare with")
+    args = parser.parse_args()
+    if not 7 <= args.days <= 30:
+        parser.error("--days must be between 7 and 30")
+
+    result = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(json.dumps(result["results"], indent=2))
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Victron field extraction benchmark for victron_scanner.
+
+Builds SmartShunt and SmartSolar advertisements encrypted with the keys in
+settings, checks that the cached per-class extractors return the same
+entity values as the original reflection-based parse_object_dict, then
+reports extraction and full decode+extract rates in adverts per second.
+
+Run from the repository root: `python -m benchmarks.bench_victron_extract`
+"""
+
+import argparse
+import inspect
+import os
+import random
+import struct
+import time
+from enum import Enum
+
+os.environ.setdefault("QUESTDB_USER", "bench")
+os.environ.setdefault("QUESTDB_PASSWORD", "bench")
+
+from Crypto.Cipher import AES  # noqa: E402
+from Crypto.Util import Counter  # noqa: E402
+from victron_ble.devices import detect_device_type  # noqa: E402
+
+from camper_api.config import settings  # noqa: E402
+from camper_api.plugins.victron_scanner import build_extractor  # noqa: E402
+
+SMARTSHUNT_MODEL = 0xA389
+SMARTSOLAR_MODEL = 0xA053
+MODE_BATTERY_MONITOR = 0x02
+MODE_SOLAR_CHARGER = 0x01
+
+
+def parse_object_dict(obj):
+    """The original reflection over every get_* method."""
+    data = {}
+    for name, method in inspect.getmembers(obj, predicate=inspect.ismethod):
+        if name.startswith("get_"):
+            value = method()
+            if isinstance(value, Enum):
+                value = value.name.lower()
+            if value is not None:
+                data[name[4:]] = value
+    return data
+
+
+def pack_bits(fields: list[tuple[int, int]]) -> bytes:
+    """Pack (value, bits) pairs LSB first, the order BitReader reads them."""
+    value, shift = 0, 0
+    for field, bits in fields:
+        value |= (field & ((1 << bits) - 1)) << shift
+        shift += bits
+    return value.to_bytes((shift + 7) // 8, "little")
+
+
+def encrypt(key: str, model: int, mode: int, iv: int, plain: bytes) -> bytes:
+    key_bytes = bytes.fromhex(key)
+    ctr = Counter.new(128, initial_value=iv, little_endian=True)
+    encrypted = AES.new(key_bytes, AES.MODE_CTR, counter=ctr).encrypt(plain)
+    return (
+        struct.pack("<HHBH", 0x0210, model, mode, iv)
+        + bytes([key_bytes[0]])
+        + encrypted
+    )
+
+
+def smartshunt_advert(rng: random.Random, key: str, iv: int) -> bytes:
+    plain = pack_bits(
+        [
+            (rng.randrange(0, 0xFFFF), 16),  # remaining_mins
+            (rng.randrange(1150, 1450), 16),  # voltage 10 mV
+            (0, 16),  # alarm
+            (rng.randrange(1150, 1450), 16),  # aux: starter voltage
+            (0, 2),  # aux_mode
+            (rng.randrange(-20000, 20000), 22),  # current mA
+            (rng.randrange(0, 2000), 20),  # consumed 0.1 Ah
+            (rng.randrange(0, 1000), 10),  # soc 0.1 %
+        ]
+    )
+    return encrypt(key, SMARTSHUNT_MODEL, MODE_BATTERY_MONITOR, iv, plain)
+
+
+def smartsolar_advert(rng: random.Random, key: str, iv: int) -> bytes:
+    plain = pack_bits(
+        [
+            (rng.choice((0, 3, 4, 5)), 8),  # charge_state
+            (0, 8),  # charger_error
+            (rng.randrange(1150, 1450), 16),  # battery voltage 10 mV
+            (rng.randrange(0, 150), 16),  # charging current 0.1 A
+            (rng.randrange(0, 100), 16),  # yield 10 Wh
+            (rng.randrange(0, 200), 16),  # solar power W
+            (rng.randrange(0, 100), 9),  # load 0.1 A
+        ]
+    )
+    return encrypt(key, SMARTSOLAR_MODEL, MODE_SOLAR_CHARGER, iv, plain)
+
+
+def adverts(count: int) -> list[tuple[str, bytes]]:
+    rng = random.Random(0)
+    shunt_key = settings.victron_sensors["SmartShunt"]["key"]
+    solar_key = settings.victron_sensors["SmartSolar"]["key"]
+    out = []
+    for iv in range(count):
+        if iv % 2:
+            out.append(("SmartShunt", smartshunt_advert(rng, shunt_key, iv)))
+        else:
+            out.append(("SmartSolar", smartsolar_advert(rng, solar_key, iv)))
+    return out
+
+
+def reference_extract(parsed, names) -> dict:
+    data = parse_object_dict(parsed)
+    return {name: data[name] for name in names if name in data}
+
+
+def cached_extract(parsed, names) -> dict:
+    out = {}
+    for name, getter in build_extractor(type(parsed), names):
+        value = getter(parsed)
+        if value is not None:
+            out[name] = value
+    return out
+
+
+def rate(fn, items, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in items:
+            fn(*item)
+        best = min(best, time.perf_counter() - started)
+    return len(items) / best
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("--adverts", type=int, default=20000)
+    arg_parser.add_argument("--repeat", type=int, default=3)
+    args = arg_parser.parse_args()
+
+    devices = {
+        name: detect_device_type(raw)(settings.victron_sensors[name]["key"])
+        for name, raw in adverts(2)
+    }
+    names = {name: tuple(settings.victron_entities[name]) for name in devices}
+    recorded = adverts(args.adverts)
+
+    parsed = [(devices[name].parse(raw), names[name]) for name, raw in recorded]
+    for data, entity_names in parsed:
+        expect = reference_extract(data, entity_names)
+        got = cached_extract(data, entity_names)
+        assert got == expect, f"{got} != {expect}"
+    print(f"{len(parsed)} adverts extract identically")
+
+    raw = [(devices[name], raw, names[name]) for name, raw in recorded]
+    for label, extract in (
+        ("reference", reference_extract),
+        ("extractor", cached_extract),
+    ):
+        extract_rate = rate(extract, parsed, args.repeat)
+        full_rate = rate(
+            lambda device, data, entity_names: extract(
+                device.parse(data), entity_names
+            ),
+            raw,
+            args.repeat,
+        )
+        print(
+            f"{label:>10}: extract {extract_rate:9.0f} adverts/s,"
+            f" decrypt+parse+extract {full_rate:8.0f} adverts/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Replay a recorded BLE advertisement log through the scanner callbacks.
+
+Feeds a log written by ApiBleakScanner (settings.ble_record_path) through
+the full routing and plugin chain: VictronScanner with decryption at every
+sample tick of the log's clock, and BTHomeScanner. No radio or bleak
+scanning is involved. Runs at maximum speed or in real time, and reports
+adverts per second and CPU time per stage.
+
+Without a recording, `--synthesize N` writes a log of N adverts from the
+configured Victron and BTHome devices plus unrelated phones and beacons.
+
+Run from the repository root:
+`python -m benchmarks.replay_adverts --synthesize 50000 adverts.log`
+"""
+
+import argparse
+import os
+import random
+import struct
+import tempfile
+import time
+from collections import defaultdict
+
+os.environ.setdefault("QUESTDB_USER", "benchmark")
+os.environ.setdefault("QUESTDB_PASSWORD", "benchmark")
+os.environ.setdefault(
+    "SQLALCHEMY_DATABASE_URL",
+    f"sqlite:///{tempfile.mkdtemp(prefix='camper-replay-')}/storage.db",
+)
+
+from bleak.backends.device import BLEDevice  # noqa: E402
+from bleak.backends.scanner import AdvertisementData  # noqa: E402
+
+from camper_api import models  # noqa: E402
+from camper_api.config import settings  # noqa: E402
+from camper_api.database import engine  # noqa: E402
+from camper_api.plugins.advert_log import AdvertLogWriter, read_advert_log  # noqa
+from camper_api.plugins.api_bleak_scanner import ApiBleakScanner  # noqa: E402
+from camper_api.plugins.bthome_bleak import BTHOME_SERVICE_UUID  # noqa: E402
+from camper_api.plugins.bthome_scanner import BTHomeScanner  # noqa: E402
+from camper_api.plugins.victron_scanner import (  # noqa: E402
+    VICTRON_MANUFACTURER_ID,
+    VictronScanner,
+)
+from benchmarks.bench_victron_extract import (  # noqa: E402
+    smartshunt_advert,
+    smartsolar_advert,
+)
+
+APPLE_MANUFACTURER_ID = 0x004C
+
+
+def synthesize(path: str, count: int, rate: float) -> None:
+    """Victron and BTHome devices at ~1 advert/s each among busy neighbours."""
+    rng = random.Random(0)
+    shunt = settings.victron_sensors["SmartShunt"]
+    solar = settings.victron_sensors["SmartSolar"]
+    bthome = list(settings.bthome_sensors.values())
+    phones = [
+        ":".join(f"{rng.randrange(256):02X}" for _ in range(6)) for _ in range(40)
+    ]
+
+    writer = AdvertLogWriter(path)
+    started = time.time()
+    iv, packet_ids = 0, defaultdict(int)
+    for i in range(count):
+        timestamp = started + i / rate
+        kind = rng.random()
+        if kind < 0.05:
+            iv += 1
+            if iv % 2:
+                data = smartshunt_advert(rng, shunt["key"], iv)
+                address = shunt["address"]
+            else:
+                data = smartsolar_advert(rng, solar["key"], iv)
+                address = solar["address"]
+            writer.write(
+                timestamp,
+                address.upper(),
+                rng.randrange(-90, -50),
+                {VICTRON_MANUFACTURER_ID: data},
+                {},
+            )
+        elif kind < 0.1:
+            address = rng.choice(bthome)
+            packet_ids[address] = (packet_ids[address] + (rng.random() < 0.5)) % 256
+            data = struct.pack(
+                "<BBBBBBBBh",
+                0x40,
+                0x00,
+                packet_ids[address],
+                0x01,
+                rng.randrange(80, 101),
+                0x2E,
+                rng.randrange(30, 80),
+                0x45,
+                rng.randrange(-50, 300),
+            )
+            writer.write(
+                timestamp,
+                address.upper(),
+                rng.randrange(-90, -50),
+                {},
+                {BTHOME_SERVICE_UUID: data},
+            )
+        else:
+            writer.write(
+                timestamp,
+                rng.choice(phones),
+                rng.randrange(-100, -60),
+                {APPLE_MANUFACTURER_ID: rng.randbytes(rng.randrange(4, 27))},
+                {},
+            )
+    writer.close()
+
+
+class StageTimer:
+    def __init__(self):
+        self.cpu_ns: dict[str, int] = defaultdict(int)
+        self.calls: dict[str, int] = defaultdict(int)
+
+    def wrap(self, stage: str, fn):
+        def timed(*args):
+            started = time.thread_time_ns()
+            try:
+                return fn(*args)
+            finally:
+                self.cpu_ns[stage] += time.thread_time_ns() - started
+                self.calls[stage] += 1
+
+        return timed
+
+
+def replay(path: str, realtime: bool, speed: float) -> None:
+    models.Base.metadata.create_all(bind=engine)
+
+    router = ApiBleakScanner()
+    victron = VictronScanner()
+    victron.register(router)
+    bthome = BTHomeScanner()
+    bthome.scanner.register(router)
+
+    timer = StageTimer()
+    for routes in router._routes.values():
+        for route in routes:
+            route.callback = timer.wrap(
+                type(route.callback.__self__).__name__, route.callback
+            )
+    dispatch = timer.wrap("routing (total)", router.detection_callback)
+    decode = timer.wrap("VictronScanner.decode_latest", victron.decode_latest)
+
+    devices: dict[str, BLEDevice] = {}
+    records = list(read_advert_log(path))
+    if not records:
+        raise SystemExit(f"{path} holds no advertisements")
+
+    log_start = records[0].timestamp
+    next_tick = log_start + settings.state_monitor_sample_interval
+    wall_start = time.perf_counter()
+    for record in records:
+        if realtime:
+            delay = (record.timestamp - log_start) / speed
+            delay -= time.perf_counter() - wall_start
+            if delay > 0:
+                time.sleep(delay)
+        if record.timestamp >= next_tick:
+            decode()
+            next_tick += settings.state_monitor_sample_interval
+
+        device = devices.get(record.address)
+        if device is None:
+            device = devices[record.address] = BLEDevice(record.address, None, None)
+        dispatch(
+            device,
+            AdvertisementData(
+                local_name=None,
+                manufacturer_data=record.manufacturer_data,
+                service_data=record.service_data,
+                service_uuids=list(record.service_data),
+                tx_power=None,
+                rssi=record.rssi,
+                platform_data=(),
+            ),
+        )
+    decode()
+    wall = time.perf_counter() - wall_start
+
+    span = records[-1].timestamp - log_start
+    print(
+        f"{len(records)} adverts spanning {span:.0f} s replayed in {wall:.2f} s:"
+        f" {len(records) / wall:.0f} adverts/s"
+    )
+    stats = router.stats()
+    print(
+        f"routed {stats['routed']}, dropped {stats['dropped']};"
+        f" Victron entities {len(victron._latest_entity_data)},"
+        f" BTHome entities {len(bthome.state_cache)}"
+    )
+    routing_ns = timer.cpu_ns["routing (total)"] - sum(
+        ns for stage, ns in timer.cpu_ns.items() if not stage.startswith("routing")
+    )
+    for stage, ns in (("routing (own)", routing_ns), *timer.cpu_ns.items()):
+        calls = timer.calls.get(stage, timer.calls["routing (total)"])
+        print(
+            f"{stage:>30}: {ns / 1e6:9.2f} ms CPU, {calls:8d} calls,"
+            f" {ns / 1e3 / max(calls, 1):7.2f} µs/call"
+        )
+
+
+def main() -> None:
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    arg_parser.add_argument("log", help="advertisement log to replay")
+    arg_parser.add_argument(
+        "--synthesize", type=int, metavar="N", help="first write N synthetic adverts"
+    )
+    arg_parser.add_argument(
+        "--rate", type=float, default=200.0, help="synthetic adverts per second"
+    )
+    arg_parser.add_argument("--realtime", action="store_true")
+    arg_parser.add_argument("--speed", type=float, default=1.0)
+    args = arg_parser.parse_args()
+
+    if args.synthesize:
+        if os.path.exists(args.log):
+            os.remove(args.log)
+        synthesize(args.log, args.synthesize, args.rate)
+    replay(args.log, args.realtime, args.speed)
+
+
+if __name__ == "__main__":
+    main()
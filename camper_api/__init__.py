@@ -0,0 +1,4 @@
+import time
+
+# Start of the package import, for the startup report
+import_started = time.perf_counter()
@@ -1,3 +1,4 @@
+from pydantic import PositiveFloat
 from pydantic_settings import BaseSettings, SettingsConfigDict
 import platform
 
@@ -13,21 +14,51 @@ class Settings(BaseSettings):
 
     state_monitor_sample_interval: int = 60  # seconds
     state_responsive_sample_interval: int = 10  # seconds
+    state_responsive_hold: int = 30  # seconds a viewer keeps a sensor responsive
     state_storage_interval: int = 5  # minutes
     state_delete_interval: int = 60 * 60  # seconds
+    scheduler_jitter: float = 1.0  # seconds added at random to aligned ticks
+    loop_lag_interval: float = 0.5  # seconds between event loop lag probes
+    loop_slow_callback_threshold: float | None = None  # seconds; report longer stalls
+    profile_max_duration: float = 60.0  # seconds
+    profile_max_overhead: PositiveFloat = 0.02  # share of a core the sampler may use
 
     questdb_upload_timeout: int = 5 * 60  # seconds
     questdb_upload_interval: int = 5 * 60  # seconds
     startup_delay: int = 5  # seconds
     questdb_startup_chunk_size: int = 100
     cache_retention: int = 5  # minutes
+    grouped_states_cache_size: int = 64  # entries
+    downsample_default_window: int = 24  # hours downsampled when no `after` given
 
     state_delete_after_days: int = 7  # days
 
     hymer_serial_port: str = "/dev/ttyS0"
-    hymer_serial_timeout: int = 10  # seconds
+    hymer_serial_timeout: int = 10  # deprecated, unused; kept for existing .env files
     hymer_serial_speed: int = 115200
     hymer_request_timeout: float = 2.0  # seconds, per request/reply round-trip
+    hymer_pipeline_window: int = 2  # requests in flight
+    hymer_busy_retries: int = 3
+    hymer_ping_interval: int = 30  # seconds without frames before a ping
+    hymer_ping_failures: int = 3  # failed pings before reconnecting
+    hymer_crc_storm_threshold: int = 20  # CRC failures per window to reconnect
+    hymer_crc_storm_window: int = 10  # seconds
+    hymer_reconnect_min_delay: float = 0.5  # seconds
+    hymer_reconnect_max_delay: float = 30.0  # seconds
+
+    ble_dedup_depth: int = 4  # payloads remembered per device
+    ble_dedup_max_age: int = 60  # seconds before a repeated payload passes again
+    ble_record_path: str | None = None  # log every advertisement to this file
+    ble_record_max_bytes: int = 64 * 1024 * 1024  # recording stops at this size
+
+    # Plugins to load at startup, see plugins/registry.py; required plugins
+    # (the BLE scanner for Victron and BTHome) are added automatically.
+    plugins: list[str] = [
+        "victron_scanner",
+        "bthome_scanner",
+        "hymer_serial",
+        "questdb_uploader",
+    ]
 
     bthome_sensors: dict[str, str] = {
         "inside": "7C:C6:B6:61:E5:68",
@@ -1,10 +1,27 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, update
+from sqlalchemy import and_, or_, update
 from datetime import datetime, timedelta
+from typing import NamedTuple
 
 from . import models, schemas
 from .memory_cache import MemoryCache
 from .config import settings
+from .metrics import REGISTRY
+
+_states_created = REGISTRY.counter(
+    "camper_states_created_total",
+    "States created, by whether only the cache or also the database was written",
+    ("target",),
+)
+_states_cached = _states_created.labels("cache")
+_states_stored = _states_created.labels("db")
+_state_lookups = REGISTRY.counter(
+    "camper_state_cache_lookups_total",
+    "Latest state lookups, by cache result",
+    ("result",),
+)
+_state_cache_hits = _state_lookups.labels("hit")
+_state_cache_misses = _state_lookups.labels("miss")
 
 
 def get_sensors(db: Session, skip: int = 0, limit: int = 100):
@@ -58,6 +75,23 @@ def get_entity_by_name(db: Session, sensor_id: int, entity_name: str):
     )
 
 
+def get_entities_by_names(db: Session, names: list[tuple[str, str]]):
+    """Return (sensor_name, entity) rows for (sensor_name, entity_name) pairs."""
+    return (
+        db.query(models.Sensor.name, models.Entity)
+        .join(models.Entity, models.Entity.sensor_id == models.Sensor.id)
+        .filter(
+            or_(
+                *(
+                    and_(models.Sensor.name == sensor, models.Entity.name == entity)
+                    for sensor, entity in names
+                )
+            )
+        )
+        .all()
+    )
+
+
 def create_entity(db: Session, entity: schemas.EntityCreate, sensor_id: int):
     db_entity = models.Entity(
         **entity.model_dump(exclude_none=True, exclude_unset=True), sensor_id=sensor_id
@@ -68,6 +102,68 @@ def create_entity(db: Session, entity: schemas.EntityCreate, sensor_id: int):
     return db_entity
 
 
+class ProvisionedSensor(NamedTuple):
+    id: int
+    address: str | None
+    key: str | None
+    entities: dict[str, int]  # entity name -> id
+
+
+def provision_sensors(
+    db: Session, sensors: dict[str, tuple[schemas.SensorCreate, list[str]]]
+) -> dict[str, ProvisionedSensor]:
+    """
+    Get or create sensors by name together with their entities.
+
+    `sensors` maps a sensor name to its create schema and entity names.
+    Existing sensors and entities are read in two queries and the missing
+    ones are created in a single commit; existing sensors are not updated.
+    """
+    db_sensors = {
+        s.name: s
+        for s in db.query(models.Sensor).filter(models.Sensor.name.in_(sensors))
+    }
+    created = False
+    for name, (sensor, _) in sensors.items():
+        if name not in db_sensors:
+            db_sensors[name] = models.Sensor(
+                **sensor.model_dump(exclude_none=True, exclude_unset=True)
+            )
+            db.add(db_sensors[name])
+            created = True
+    db.flush()
+
+    db_entities: dict[int, dict[str, models.Entity]] = {
+        s.id: {} for s in db_sensors.values()
+    }
+    for e in db.query(models.Entity).filter(models.Entity.sensor_id.in_(db_entities)):
+        db_entities[e.sensor_id][e.name] = e
+    for name, (_, entity_names) in sensors.items():
+        sensor_id = db_sensors[name].id
+        for entity_name in entity_names:
+            if entity_name not in db_entities[sensor_id]:
+                db_entities[sensor_id][entity_name] = models.Entity(
+                    name=entity_name, sensor_id=sensor_id
+                )
+                db.add(db_entities[sensor_id][entity_name])
+                created = True
+    db.flush()
+
+    # Read ids before the commit expires the instances
+    provisioned = {
+        name: ProvisionedSensor(
+            s.id,
+            s.address,
+            s.key,
+            {e.name: e.id for e in db_entities[s.id].values()},
+        )
+        for name, s in db_sensors.items()
+    }
+    if created:
+        db.commit()
+    return provisioned
+
+
 def get_states(
     db: Session,
     entity_id: int = None,
@@ -89,6 +185,26 @@ def get_states(
     return states_query.order_by(models.State.created).offset(skip).limit(limit).all()
 
 
+def get_state_rows(db: Session, entity_id: int, start: datetime):
+    """Return (created, state) tuples for an entity from `start` onwards."""
+    return (
+        db.query(models.State.created, models.State.state)
+        .filter(models.State.entity_id == entity_id, models.State.created >= start)
+        .order_by(models.State.created)
+        .all()
+    )
+
+
+def get_state_rows_multi(db: Session, entity_ids: list[int], start: datetime):
+    """Return (entity_id, created, state) tuples for entities in one range scan."""
+    return (
+        db.query(models.State.entity_id, models.State.created, models.State.state)
+        .filter(models.State.entity_id.in_(entity_ids), models.State.created >= start)
+        .order_by(models.State.entity_id, models.State.created)
+        .all()
+    )
+
+
 async def create_state(db: Session, entity_id: int, state: str):
     stamp = datetime.now().replace(microsecond=0)
 
@@ -101,6 +217,7 @@ async def create_state(db: Session, entity_id: int, state: str):
     ):
         # Just update cache
         await backend.set(f"state_{entity_id}", state, stamp, v_old.stored)
+        _states_cached.inc()
 
     else:
         db_item = models.State(
@@ -109,20 +226,63 @@ async def create_state(db: Session, entity_id: int, state: str):
             created=stamp,
         )
         db.add(db_item)
-        db.commit()
+        try:
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
 
         await backend.set(f"state_{entity_id}", state, stamp, stamp)
+        _states_stored.inc()
 
     return schemas.State(entity_id=entity_id, state=state, created=stamp)
 
 
+async def create_states(db: Session, states: dict[int, str]) -> int:
+    """
+    Batched create_state: one cache update and at most one commit.
+
+    Returns the number of states written to the database.
+    """
+    stamp = datetime.now().replace(microsecond=0)
+    store_before = datetime.now() - timedelta(minutes=settings.state_storage_interval)
+
+    backend = MemoryCache.get_backend()
+    due = await backend.set_many(
+        {f"state_{entity_id}": state for entity_id, state in states.items()},
+        stamp,
+        store_before,
+    )
+
+    db_items = [
+        models.State(entity_id=entity_id, state=state, created=stamp)
+        for entity_id, state in states.items()
+        if f"state_{entity_id}" in due
+    ]
+    if db_items:
+        db.add_all(db_items)
+        try:
+            db.commit()
+        except Exception:
+            # Keep the states due, so the next sample stores them.
+            db.rollback()
+            await backend.restore_stored(due)
+            raise
+
+    _states_stored.inc(len(db_items))
+    _states_cached.inc(len(states) - len(db_items))
+    return len(db_items)
+
+
 async def get_state(db: Session, entity_id: int):
     backend = MemoryCache.get_backend()
     v = await backend.get(f"state_{entity_id}")
 
     if v:
+        _state_cache_hits.inc()
         return schemas.State(entity_id=entity_id, state=v.data_str, created=v.created)
 
+    _state_cache_misses.inc()
     db_query = db.query(models.State).filter(models.State.entity_id == entity_id)
 
     age_threshold = datetime.now() - timedelta(minutes=5)
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+# numpy is imported on first use to keep the API's cold start short
+if TYPE_CHECKING:
+    import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets; return the indices of `points` samples.
+
+    The first and last sample are always kept. Every bucket in between keeps
+    the sample forming the largest triangle with the previously kept sample
+    and the average of the next bucket.
+    """
+    import numpy as np
+
+    n = len(x)
+    if points >= n or points < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    indices = np.empty(points, dtype=int)
+    indices[0] = 0
+    indices[-1] = n - 1
+
+    a = 0
+    for i in range(points - 2):
+        start, end = edges[i], edges[i + 1]
+        if i + 2 < points - 1:
+            next_start, next_end = edges[i + 1], edges[i + 2]
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(area.argmax())
+        indices[i + 1] = a
+
+    return indices
+
+
+def minmax(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    M4 downsampling; return the indices of the first, last, minimum and
+    maximum sample of `points // 4` equal-width time buckets.
+
+    A bucket keeps up to four samples, so fewer than four points fall back
+    to lttb.
+    """
+    import numpy as np
+
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+    if points < 4:
+        return lttb(x, y, points)
+    buckets = points // 4
+
+    span = x[-1] - x[0]
+    if span <= 0:
+        bucket = np.zeros(n, dtype=int)
+    else:
+        bucket = np.minimum(((x - x[0]) / span * buckets).astype(int), buckets - 1)
+
+    # x is sorted, so bucket ids are non-decreasing
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], n] - 1
+
+    order = np.lexsort((y, bucket))
+    group_starts = np.searchsorted(bucket[order], bucket[starts], side="left")
+    group_ends = np.searchsorted(bucket[order], bucket[starts], side="right") - 1
+
+    return np.unique(
+        np.concatenate((starts, ends, order[group_starts], order[group_ends]))
+    )
+
+
+METHODS = {"lttb": lttb, "minmax": minmax}
+
+
+def downsample_states(states: list, method: str, points: int) -> list:
+    """
+    Reduce numeric states to at most `points` samples with `method`.
+
+    Raises ValueError when a state is not numeric.
+    """
+    import numpy as np
+
+    if len(states) <= points:
+        return states
+
+    x = np.array([s.created.timestamp() for s in states], dtype=float)
+    try:
+        y = np.array([s.state for s in states], dtype=float)
+    except ValueError:
+        raise ValueError("Downsampling is only supported for numeric states")
+
+    indices = METHODS[method](x, y, points)
+    return [states[i] for i in indices]
@@ -0,0 +1,474 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from threading import Lock
+from typing import TYPE_CHECKING, Optional
+
+from sqlalchemy.orm import Session
+
+from . import crud
+from .config import settings
+from .metrics import REGISTRY
+from .single_flight import SingleFlight
+
+# pandas takes seconds to import on a Pi Zero; it is imported on first use
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+def _pd():
+    import pandas
+
+    return pandas
+
+
+def _to_offset(period: str):
+    return _pd().tseries.frequencies.to_offset(period)
+
+
+def _is_tick(offset) -> bool:
+    """Fixed-length frequencies (h, min, s), which align to the epoch."""
+    return isinstance(offset, _pd().offsets.Tick)
+
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+_phase_time = REGISTRY.histogram(
+    "camper_grouped_states_phase_seconds",
+    "Time spent per phase of grouped state reads",
+    ("phase",),
+)
+_query_time = _phase_time.labels("query")
+_dataframe_time = _phase_time.labels("dataframe")
+_resample_time = _phase_time.labels("resample")
+
+
+@dataclass
+class GroupedEntry:
+    is_numeric: bool
+    # Start of the bucket that was still open when the entry was last updated.
+    # Every bucket before it is closed and will not receive new states.
+    closed_until: pd.Timestamp
+    buckets: dict = field(default_factory=dict)
+
+
+def bucket_bounds(period: str, samples: int, now: datetime):
+    """
+    Return (window_start, open_start) aligned to `period` bucket boundaries.
+
+    Raises ValueError for non-fixed frequencies (e.g. 'MS', '2D') which do
+    not resample on floored boundaries; those are computed without the cache.
+    """
+    offset = _to_offset(period)
+    if not _is_tick(offset) and offset != _pd().offsets.Day(1):
+        raise ValueError(f"{period} is not a fixed frequency")
+    open_start = _pd().Timestamp(now).floor(offset)
+    window_start = open_start - (samples - 1) * offset
+    return window_start, open_start
+
+
+def numeric_values(states: pd.Series) -> pd.Series:
+    """
+    States as numbers, NaN where a state is not a number. An entity is
+    numeric when all its states are; a "nan" reading makes it a string entity.
+    """
+    return _pd().to_numeric(states, errors="coerce")
+
+
+def aggregate_rows(rows, period: str):
+    """
+    Aggregate (created, state) rows into buckets.
+
+    Numeric data yields {bucket: (min, max, mean)}, string data yields
+    {bucket: [(created, timestamp, state), ...]}.
+    """
+    with _dataframe_time.timer():
+        states_df = _pd().DataFrame(rows, columns=["created", "state"])
+        states_df["created"] = _pd().to_datetime(states_df["created"])
+        states_df = states_df.set_index("created")
+
+        values = numeric_values(states_df["state"])
+        is_numeric = bool(values.notna().all())
+        if is_numeric:
+            states_df["state"] = values
+        else:
+            states_df["state"] = states_df["state"].astype(str)
+
+    if not is_numeric:
+        with _resample_time.timer():
+            try:
+                bucket_index = states_df.index.floor(period)
+            except ValueError:
+                bucket_index = states_df.index
+            timestamps = states_df.index.strftime(TIMESTAMP_FORMAT)
+            buckets = {}
+            for bucket, created, stamp, state in zip(
+                bucket_index, states_df.index, timestamps, states_df["state"].tolist()
+            ):
+                buckets.setdefault(bucket, []).append((created, stamp, state))
+        return False, buckets
+
+    with _resample_time.timer():
+        # Align Tick buckets (h, min, s) to the epoch so they match bucket_bounds
+        is_tick = _is_tick(_to_offset(period))
+        resampled_df = (
+            states_df["state"]
+            .resample(period, origin="epoch" if is_tick else "start_day")
+            .agg(["min", "max", "mean"])
+            .dropna()
+        )
+        buckets = {
+            bucket: (mn, mx, mean)
+            for bucket, mn, mx, mean in zip(
+                resampled_df.index,
+                resampled_df["min"].tolist(),
+                resampled_df["max"].tolist(),
+                resampled_df["mean"].tolist(),
+            )
+        }
+    return True, buckets
+
+
+def format_intervals(buckets: dict, period: str, until: datetime) -> dict:
+    """
+    Run-length encode string buckets in a single pass over the rows.
+
+    Returns (start, end, state) intervals, where a state lasts until the next
+    change and the current state until `until`, and per bucket time-in-state
+    percentages for fixed frequencies.
+    """
+    intervals = []
+    for _, rows in sorted(buckets.items()):
+        for created, _, state in rows:
+            if intervals and intervals[-1][2] == state:
+                intervals[-1][1] = created
+            else:
+                if intervals:
+                    intervals[-1][1] = created
+                intervals.append([created, created, state])
+    if intervals:
+        intervals[-1][1] = max(intervals[-1][1], _pd().Timestamp(until))
+
+    offset = _to_offset(period)
+    durations: dict[pd.Timestamp, dict[str, float]] = {}
+    for start, end, state in intervals:
+        try:
+            bucket = start.floor(offset)
+        except ValueError:
+            break
+        while start < end:
+            segment_end = min(end, bucket + offset)
+            per_state = durations.setdefault(bucket, {})
+            per_state[state] = (
+                per_state.get(state, 0.0) + (segment_end - start).total_seconds()
+            )
+            start = bucket = segment_end
+
+    unique_states = list(dict.fromkeys(state for _, _, state in intervals))
+    time_in_state = {
+        "timestamps": [b.strftime(TIMESTAMP_FORMAT) for b in sorted(durations)],
+        "percentages": {state: [] for state in unique_states},
+    }
+    for bucket in sorted(durations):
+        total = sum(durations[bucket].values())
+        for state in unique_states:
+            time_in_state["percentages"][state].append(
+                round(100 * durations[bucket].get(state, 0.0) / total, 2)
+            )
+
+    return {
+        "unique_states": unique_states,
+        "intervals": [
+            [start.strftime(TIMESTAMP_FORMAT), end.strftime(TIMESTAMP_FORMAT), state]
+            for start, end, state in intervals
+        ],
+        "time_in_state": time_in_state,
+    }
+
+
+def format_buckets(is_numeric: bool, buckets: dict) -> dict:
+    ordered = sorted(buckets.items())
+
+    if is_numeric:
+        return {
+            "timestamps": [b.strftime(TIMESTAMP_FORMAT) for b, _ in ordered],
+            "min": [v[0] for _, v in ordered],
+            "max": [v[1] for _, v in ordered],
+            "mean": [v[2] for _, v in ordered],
+        }
+
+    # For string data, group by unique values
+    state_data = {}
+    for _, rows in ordered:
+        for _, stamp, state in rows:
+            state_data.setdefault(state, []).append(stamp)
+
+    return {
+        "unique_states": list(state_data.keys()),
+        "state_data": [
+            {"state": state, "timestamps": timestamps}
+            for state, timestamps in state_data.items()
+        ],
+    }
+
+
+class GroupedStatesCache:
+    """
+    Bounded LRU cache of grouped results keyed on (entity_id, period, samples).
+
+    Buckets are aligned to `period` boundaries. Closed buckets are kept and
+    only states from the trailing open bucket onwards are queried and
+    aggregated on a refresh.
+    """
+
+    def __init__(self, max_entries: int):
+        self._max_entries = max_entries
+        self._entries: OrderedDict[tuple, GroupedEntry] = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get(self, key: tuple) -> Optional[GroupedEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key: tuple, entry: GroupedEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, entity_id: int) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == entity_id]:
+                del self._entries[key]
+
+    def invalidate_before(self, threshold: datetime) -> None:
+        """
+        Drop entries with buckets starting before `threshold`, after their
+        states were deleted. Partly deleted buckets are recomputed in full.
+        """
+        with self._lock:
+            for key in [
+                k
+                for k, entry in self._entries.items()
+                if entry.buckets and min(entry.buckets) < threshold
+            ]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+            entries, evictions = len(self._entries), self.evictions
+        requests = hits + misses
+        return {
+            "entries": entries,
+            "max_entries": self._max_entries,
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions,
+            "hit_ratio": hits / requests if requests else 0.0,
+        }
+
+    def grouped_data(
+        self,
+        db: Session,
+        entity_id: int,
+        period: str,
+        samples: int,
+        window_start: pd.Timestamp,
+        open_start: pd.Timestamp,
+    ):
+        """Return (is_numeric, buckets) for the entity, reusing closed buckets."""
+        key = (entity_id, period, samples)
+
+        entry = self._get(key)
+        if entry is not None and not (window_start <= entry.closed_until <= open_start):
+            entry = None
+
+        if entry is not None:
+            with _query_time.timer():
+                rows = crud.get_state_rows(
+                    db, entity_id, entry.closed_until.to_pydatetime()
+                )
+            is_numeric, buckets = (
+                aggregate_rows(rows, period) if rows else (entry.is_numeric, {})
+            )
+            if entry.buckets and entry.is_numeric != is_numeric:
+                # Type changed within the window; closed buckets can not be merged.
+                entry = None
+
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            with _query_time.timer():
+                rows = crud.get_state_rows(db, entity_id, window_start.to_pydatetime())
+            is_numeric, buckets = aggregate_rows(rows, period) if rows else (False, {})
+        else:
+            with self._lock:
+                self.hits += 1
+
+        closed = {
+            b: v
+            for b, v in (entry.buckets.items() if entry else ())
+            if b >= window_start
+        }
+        closed.update({b: v for b, v in buckets.items() if b < open_start})
+        self._put(key, GroupedEntry(is_numeric, open_start, closed))
+
+        merged = dict(closed)
+        merged.update({b: v for b, v in buckets.items() if b >= open_start})
+        return is_numeric, merged
+
+
+grouped_states_cache = GroupedStatesCache(settings.grouped_states_cache_size)
+grouped_states_flight = SingleFlight()
+
+
+def normalize_period(period: str) -> str:
+    """Normalize equivalent spellings ('4h', '240min') to one key."""
+    offset = _to_offset(period)
+    if _is_tick(offset):
+        offset = _to_offset(_pd().Timedelta(offset))
+    return offset.freqstr
+
+
+def read_grouped_data(
+    db: Session, entity_id: int, period: str, samples: int, intervals: bool = False
+):
+    """
+    Return (is_numeric, data) for the last `samples` periods of an entity.
+
+    Concurrent identical requests share one computation. Fixed frequencies
+    go through the bucket cache; other frequencies are computed over the full
+    range. With `intervals` string data is returned run-length encoded.
+    Raises ValueError for invalid periods.
+    """
+    period = normalize_period(period)
+    return grouped_states_flight.do(
+        (entity_id, period, samples, intervals),
+        _read_grouped_data,
+        db,
+        entity_id,
+        period,
+        samples,
+        intervals,
+    )
+
+
+def _read_grouped_data(
+    db: Session, entity_id: int, period: str, samples: int, intervals: bool
+):
+    now = datetime.now()
+    try:
+        window_start, open_start = bucket_bounds(period, samples, now)
+    except ValueError:
+        # Non-fixed frequency; create a date range with the specified frequency
+        date_range = _pd().date_range(end=now, periods=samples, freq=period)
+        with _query_time.timer():
+            rows = crud.get_state_rows(db, entity_id, date_range[0].to_pydatetime())
+        is_numeric, buckets = aggregate_rows(rows, period) if rows else (False, {})
+    else:
+        is_numeric, buckets = grouped_states_cache.grouped_data(
+            db, entity_id, period, samples, window_start, open_start
+        )
+
+    if not buckets:
+        return False, []
+    if intervals and not is_numeric:
+        return is_numeric, format_intervals(buckets, period, now)
+    return is_numeric, format_buckets(is_numeric, buckets)
+
+
+def read_grouped_data_multi(
+    db: Session,
+    entity_ids: list[int],
+    period: str,
+    samples: int,
+    intervals: bool = False,
+):
+    """
+    Return (timestamps, {entity_id: (is_numeric, data)}) for several entities.
+
+    All states are fetched in one range scan and numeric entities are
+    bucketed in one grouped pass. Numeric series are aligned to the shared
+    `timestamps`, with None where an entity has no data in a bucket.
+    Raises ValueError for invalid periods.
+    """
+    period = normalize_period(period)
+    now = datetime.now()
+    try:
+        window_start, _ = bucket_bounds(period, samples, now)
+    except ValueError:
+        window_start = _pd().date_range(end=now, periods=samples, freq=period)[0]
+
+    with _query_time.timer():
+        rows = crud.get_state_rows_multi(db, entity_ids, window_start.to_pydatetime())
+    results = {entity_id: (False, []) for entity_id in entity_ids}
+    if not rows:
+        return [], results
+
+    with _dataframe_time.timer():
+        states_df = _pd().DataFrame(rows, columns=["entity_id", "created", "state"])
+        states_df["created"] = _pd().to_datetime(states_df["created"])
+        states_df["value"] = numeric_values(states_df["state"])
+        numeric = states_df["value"].notna().groupby(states_df["entity_id"]).all()
+
+    # String entities are grouped per entity like read_grouped_data
+    for entity_id in numeric.index[~numeric]:
+        entity_df = states_df[states_df["entity_id"] == entity_id]
+        _, buckets = aggregate_rows(
+            list(zip(entity_df["created"], entity_df["state"])), period
+        )
+        if intervals:
+            results[entity_id] = (False, format_intervals(buckets, period, now))
+        else:
+            results[entity_id] = (False, format_buckets(False, buckets))
+
+    numeric_df = states_df[states_df["entity_id"].isin(numeric.index[numeric])]
+    if numeric_df.empty:
+        return [], results
+
+    is_tick = _is_tick(_to_offset(period))
+    with _resample_time.timer():
+        grouped_df = (
+            numeric_df.groupby(
+                [
+                    "entity_id",
+                    _pd().Grouper(
+                        key="created",
+                        freq=period,
+                        origin="epoch" if is_tick else "start_day",
+                    ),
+                ]
+            )["value"]
+            .agg(["min", "max", "mean"])
+            .dropna()
+        )
+    timestamps = grouped_df.index.get_level_values("created").unique().sort_values()
+
+    for entity_id, entity_df in grouped_df.groupby(level="entity_id"):
+        entity_df = entity_df.droplevel("entity_id").reindex(timestamps)
+        entity_df = entity_df.astype(object).where(entity_df.notna(), None)
+        results[entity_id] = (
+            True,
+            {
+                "min": entity_df["min"].tolist(),
+                "max": entity_df["max"].tolist(),
+                "mean": entity_df["mean"].tolist(),
+            },
+        )
+
+    return timestamps.strftime(TIMESTAMP_FORMAT).tolist(), results
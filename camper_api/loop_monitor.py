@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+
+from .metrics import REGISTRY
+
+logger = logging.getLogger("uvicorn.camper-api.loop_monitor")
+
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+@dataclass
+class SlowSite:
+    """Stalls of the event loop attributed to one call site."""
+
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+    stack: list[str] = field(default_factory=list)
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total_s": round(self.total, 4),
+            "max_s": round(self.max, 4),
+            "stack": self.stack,
+        }
+
+
+def _call_site(stack: traceback.StackSummary) -> str:
+    """The innermost frame in our own code, else the innermost frame."""
+    for frame in reversed(stack):
+        if frame.filename.startswith(PACKAGE_DIR):
+            filename = os.path.relpath(frame.filename, PACKAGE_DIR)
+            return f"{filename}:{frame.lineno} {frame.name}"
+    frame = stack[-1]
+    return f"{frame.filename}:{frame.lineno} {frame.name}"
+
+
+class LoopMonitor:
+    """
+    Measures how late the event loop runs its callbacks.
+
+    A timer sleeping `interval` seconds records how much later than asked
+    it woke up. With a `slow_threshold`, a watchdog thread also pings the
+    loop; when a ping is not handled within the threshold the stack of the
+    loop thread is captured, so the code holding the loop is caught in the
+    act. Stalls are grouped by the innermost frame in camper_api code.
+    """
+
+    def __init__(self, interval: float, slow_threshold: float | None = None):
+        self.interval = interval
+        self.slow_threshold = slow_threshold
+        self.lag = REGISTRY.histogram(
+            "camper_event_loop_lag_seconds",
+            "Delay of event loop timers beyond their due time",
+            buckets=LAG_BUCKETS,
+        )
+        self.max_lag = 0.0
+        self.stalls = 0
+        self.slow_sites: dict[str, SlowSite] = {}
+        self._lock = threading.Lock()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread_id: int | None = None
+        self._lag_handle: asyncio.Task | None = None
+        self._watchdog: threading.Thread | None = None
+        self._stopping = threading.Event()
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopping.clear()
+        self._lag_handle = asyncio.create_task(self._lag_task())
+        if self.slow_threshold:
+            self._watchdog = threading.Thread(
+                target=self._watchdog_thread, name="loop-watchdog", daemon=True
+            )
+            self._watchdog.start()
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._lag_handle is not None:
+            self._lag_handle.cancel()
+        if self._watchdog is not None:
+            await asyncio.to_thread(self._watchdog.join)
+            self._watchdog = None
+
+    def stats(self, top: int = 10) -> dict:
+        with self._lock:
+            sites = sorted(
+                self.slow_sites.items(), key=lambda item: item[1].total, reverse=True
+            )
+            slow = {site: s.as_dict() for site, s in sites[:top]}
+        return {
+            "interval": self.interval,
+            "lag": self.lag.snapshot(),
+            "max_lag": self.max_lag,
+            "slow_threshold": self.slow_threshold,
+            "stalls": self.stalls,
+            "slow_sites": slow,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self.slow_sites.clear()
+            self.stalls = 0
+        self.max_lag = 0.0
+
+    async def _lag_task(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - started - self.interval, 0.0)
+            self.lag.observe(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def _watchdog_thread(self) -> None:
+        while not self._stopping.is_set():
+            handled = threading.Event()
+            pinged = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(handled.set)
+            except RuntimeError:
+                return  # loop closed
+            if not handled.wait(self.slow_threshold):
+                frame = sys._current_frames().get(self._loop_thread_id)
+                stack = traceback.extract_stack(frame) if frame else None
+                while not handled.wait(1.0):
+                    if self._stopping.is_set():
+                        return
+                if stack:
+                    self._record(stack, time.perf_counter() - pinged)
+            self._stopping.wait(self.slow_threshold)
+
+    def _record(self, stack: traceback.StackSummary, duration: float) -> None:
+        site = _call_site(stack)
+        with self._lock:
+            self.stalls += 1
+            slow = self.slow_sites.setdefault(site, SlowSite())
+            slow.count += 1
+            slow.total += duration
+            if duration > slow.max:
+                slow.max = duration
+                slow.stack = [
+                    f"{frame.filename}:{frame.lineno} {frame.name}: {frame.line}"
+                    for frame in stack[-8:]
+                ]
+        logger.warning(f"Event loop blocked for {duration:.3f}s at {site}")
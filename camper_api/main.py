@@ -1,22 +1,35 @@
-from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from contextlib import asynccontextmanager
 from sqlalchemy.orm import Session
 from sqlalchemy import delete
-import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
-from typing import cast
-import pandas as pd
+from typing import TYPE_CHECKING, Literal, cast
 
-from . import crud, models, schemas
+from . import crud, import_started, models, schemas
 from .database import engine, get_db
-from .plugins.victron_scanner import VictronScanner
-from .plugins.hymer_serial import HymerSerial
-from .plugins.bthome_scanner import BTHomeScanner
-from .plugins.api_bleak_scanner import ApiBleakScanner
-from .plugins.questdb_uploader import QuestDbUploader
+from .plugins.registry import StartupReport, load_plugins
 
+if TYPE_CHECKING:
+    from .plugins.victron_scanner import VictronScanner
+    from .plugins.hymer_serial import HymerSerial
+    from .plugins.bthome_scanner import BTHomeScanner
+    from .plugins.api_bleak_scanner import ApiBleakScanner
+    from .plugins.questdb_uploader import QuestDbUploader
+
+from .loop_monitor import LoopMonitor
 from .memory_cache import MemoryCache
+from .metrics import REGISTRY
+from .profiler import profile
+from .scheduler import Scheduler, entity_sampler
+from .downsample import downsample_states
+from .grouped_states import (
+    grouped_states_cache,
+    grouped_states_flight,
+    read_grouped_data,
+    read_grouped_data_multi,
+)
 from .config import settings
 
 
@@ -24,57 +37,126 @@ logger = logging.getLogger("uvicorn.camper-api.main")
 logging.basicConfig()
 logger.setLevel(logging.WARNING)
 
-models.Base.metadata.create_all(bind=engine)
+_states_deleted = REGISTRY.counter(
+    "camper_states_deleted_total", "States deleted after state_delete_after_days"
+)
 
 
 class DeleteOldStates:
     def __init__(self):
         self._db = next(get_db())
 
-    async def process_task(self):
-        while 1:
-            delete_threshold = (
-                datetime.now() - timedelta(days=settings.state_delete_after_days)
-            ).replace(microsecond=0)
-            logger.info(f"Deleting data older than {delete_threshold}")
+    async def run(self):
+        delete_threshold = (
+            datetime.now() - timedelta(days=settings.state_delete_after_days)
+        ).replace(microsecond=0)
+        logger.info(f"Deleting data older than {delete_threshold}")
 
-            self._db.query(models.State).filter(
-                models.State.created < delete_threshold
-            ).delete()
-            self._db.commit()
+        deleted = (
+            self._db.query(models.State)
+            .filter(models.State.created < delete_threshold)
+            .delete()
+        )
+        self._db.commit()
+        _states_deleted.inc(deleted)
+        if deleted:
+            grouped_states_cache.invalidate_before(delete_threshold)
 
-            await asyncio.sleep(settings.state_delete_interval)
 
+startup_report = StartupReport()
+startup_report.add("app", "import", time.perf_counter() - import_started)
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    api_bleak_scanner = ApiBleakScanner()
-    victron_scanner = VictronScanner()
-    api_bleak_scanner.add_callback(victron_scanner.detection_callback)
-    bthome_scanner = BTHomeScanner()
-    api_bleak_scanner.add_callback(bthome_scanner.scanner.detection_callback)
-    hymer_serial = HymerSerial()
-    delete_old_tasks = DeleteOldStates()
-    questdb_uploader = QuestDbUploader()
 
-    MemoryCache.init()
+def get_plugin(request: Request, name: str, required: bool = True):
+    """A plugin from the lifespan state; 503 if required but not enabled."""
+    plugin = getattr(request.state, name, None)
+    if plugin is None and required:
+        raise HTTPException(status_code=503, detail=f"Plugin {name} is not enabled")
+    return plugin
 
-    asyncio.create_task(delete_old_tasks.process_task())
-    asyncio.create_task(victron_scanner.process_task())
-    await hymer_serial.start()
-    asyncio.create_task(bthome_scanner.process_runner())
-    asyncio.create_task(questdb_uploader.process_runner())
 
-    await api_bleak_scanner.start()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop_monitor = LoopMonitor(
+        settings.loop_lag_interval, settings.loop_slow_callback_threshold
+    )
+    await loop_monitor.start()
 
+    # Stop the monitor and scheduler also when startup fails halfway.
+    scheduler = Scheduler()
     try:
-        yield {
-            "victron_scanner": victron_scanner,
-            "hymer_serial": hymer_serial,
-            "bthome_scanner": bthome_scanner,
-        }
+        with startup_report.measure("database", "init"):
+            models.Base.metadata.create_all(bind=engine)
+            MemoryCache.init()
+            delete_old_tasks = DeleteOldStates()
+
+        plugins = load_plugins(settings.plugins, startup_report)
+        api_bleak_scanner = cast(
+            "ApiBleakScanner | None", plugins.get("api_bleak_scanner")
+        )
+        victron_scanner = cast("VictronScanner | None", plugins.get("victron_scanner"))
+        bthome_scanner = cast("BTHomeScanner | None", plugins.get("bthome_scanner"))
+        hymer_serial = cast("HymerSerial | None", plugins.get("hymer_serial"))
+        questdb_uploader = cast(
+            "QuestDbUploader | None", plugins.get("questdb_uploader")
+        )
+
+        scheduler.add_job(
+            "delete_old_states",
+            delete_old_tasks.run,
+            settings.state_delete_interval,
+            align=False,
+        )
+        if victron_scanner is not None:
+            victron_scanner.register(api_bleak_scanner)
+            scheduler.add_job(
+                "victron_sample",
+                victron_scanner.sample,
+                settings.state_responsive_sample_interval,
+                jitter=settings.scheduler_jitter,
+            )
+        if bthome_scanner is not None:
+            bthome_scanner.scanner.register(api_bleak_scanner)
+            scheduler.add_job(
+                "bthome_sample",
+                bthome_scanner.sample,
+                settings.state_responsive_sample_interval,
+                jitter=settings.scheduler_jitter,
+            )
+        if questdb_uploader is not None:
+            scheduler.add_job(
+                "questdb_upload",
+                questdb_uploader.upload,
+                settings.questdb_upload_interval,
+                initial_delay=settings.startup_delay,
+                align=False,
+            )
+        await scheduler.start()
+
+        if hymer_serial is not None:
+            with startup_report.measure("hymer_serial", "start"):
+                await hymer_serial.start()
+
+        if api_bleak_scanner is not None:
+            if settings.ble_record_path:
+                api_bleak_scanner.start_recording(
+                    settings.ble_record_path, settings.ble_record_max_bytes
+                )
+            with startup_report.measure("api_bleak_scanner", "start"):
+                await api_bleak_scanner.start()
+
+        startup_report.log()
+
+        try:
+            yield {**plugins, "scheduler": scheduler, "loop_monitor": loop_monitor}
+        finally:
+            if hymer_serial is not None:
+                await hymer_serial.stop()
+            if api_bleak_scanner is not None:
+                await api_bleak_scanner.stop()
     finally:
-        await hymer_serial.stop()
+        await scheduler.stop()
+        await loop_monitor.stop()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -110,11 +192,15 @@ def update_sensor(
     db.refresh(db_sensor)
 
     # Update device data in ble scanner
-    scanner = cast(VictronScanner, request.state.victron_scanner)
-    scanner.remove_device(db_sensor.address)
+    scanner = cast(
+        "VictronScanner | None",
+        get_plugin(request, "victron_scanner", required=False),
+    )
+    if scanner is not None:
+        scanner.remove_device(db_sensor.address)
 
-    entities = {e.name: e.id for e in db_sensor.entities}
-    scanner.add_device(db_sensor.address, db_sensor.key, entities)
+        entities = {e.name: e.id for e in db_sensor.entities}
+        scanner.add_device(db_sensor.address, db_sensor.key, entities)
 
     return db_sensor
 
@@ -132,10 +218,13 @@ def create_sensor(
     db_sensor = crud.create_sensor(db, sensor)
 
     # Update device data in ble scanner
-    scanner = cast(VictronScanner, request.state.victron_scanner)
-
-    entities = {e.name: e.id for e in db_sensor.entities}
-    scanner.add_device(db_sensor.address, db_sensor.key, entities)
+    scanner = cast(
+        "VictronScanner | None",
+        get_plugin(request, "victron_scanner", required=False),
+    )
+    if scanner is not None:
+        entities = {e.name: e.id for e in db_sensor.entities}
+        scanner.add_device(db_sensor.address, db_sensor.key, entities)
 
     return db_sensor
 
@@ -151,8 +240,15 @@ async def delete_sensor(
         raise HTTPException(status_code=404, detail=f"Sensor {sensor_id} not found")
 
     # Update device data in ble scanner
-    scanner = cast(VictronScanner, request.state.victron_scanner)
-    scanner.remove_device(db_sensor.address)
+    scanner = cast(
+        "VictronScanner | None",
+        get_plugin(request, "victron_scanner", required=False),
+    )
+    if scanner is not None:
+        scanner.remove_device(db_sensor.address)
+
+    for db_entity in db_sensor.entities:
+        grouped_states_cache.invalidate(db_entity.id)
 
     db.delete(db_sensor)
     db.commit()
@@ -183,15 +279,22 @@ async def read_sensor_states_by_sensor_id_or_name(
     sensor_id_name: str,
     request: Request,
     subscribe_telemetry: bool = False,
+    refresh: bool = False,
     db: Session = Depends(get_db),
 ):
     """
     Return the latest cached state per entity for the given sensor.
 
     `subscribe_telemetry=true` is a best-effort hint that the UI is actively
-    polling the camper sensor: it bumps the firmware into fast-push mode for
-    the next ~30 s. Telemetry continues to flow into the state cache either
-    way; this just controls cadence.
+    polling the sensor: it bumps the camper firmware into fast-push mode and
+    samples BLE sensors at the responsive interval for the next ~30 s.
+    Values continue to flow into the state cache either way and database
+    writes stay governed by the storage interval; this just controls cadence.
+
+    `refresh=true` polls the camper board for all values before answering;
+    concurrent refreshes share a single firmware round trip. For a Victron
+    sensor it decodes the newest advertisement instead of waiting for the
+    next sample tick.
     """
     try:
         sensor_id = int(sensor_id_name)
@@ -204,11 +307,26 @@ async def read_sensor_states_by_sensor_id_or_name(
             status_code=404, detail=f"Sensor {sensor_id_name} not found"
         )
 
+    entities = crud.get_entities_by_sensor(db, sensor.id)
+
     if subscribe_telemetry and sensor.name == settings.hymer_sensor:
-        hymer_serial = cast(HymerSerial, request.state.hymer_serial)
+        hymer_serial = cast("HymerSerial", get_plugin(request, "hymer_serial"))
         hymer_serial.bump_subscription()
+    elif subscribe_telemetry:
+        entity_sampler.watch(
+            [entity.id for entity in entities], settings.state_responsive_hold
+        )
 
-    entities = crud.get_entities_by_sensor(db, sensor.id)
+    if refresh and sensor.name == settings.hymer_sensor:
+        hymer_serial = cast("HymerSerial", get_plugin(request, "hymer_serial"))
+        await hymer_serial.get_all()
+    elif refresh and sensor.address:
+        scanner = cast(
+            "VictronScanner | None",
+            get_plugin(request, "victron_scanner", required=False),
+        )
+        if scanner is not None:
+            await scanner.refresh(sensor.address)
 
     db_states = []
     for entity in entities:
@@ -251,8 +369,12 @@ def create_entity(
     db_entity = crud.create_entity(db, entity, sensor_id)
 
     # Update device data in ble scanner
-    scanner = cast(VictronScanner, request.state.victron_scanner)
-    scanner.add_entity(db_sensor.address, db_entity.name, db_entity.id)
+    scanner = cast(
+        "VictronScanner | None",
+        get_plugin(request, "victron_scanner", required=False),
+    )
+    if scanner is not None:
+        scanner.add_entity(db_sensor.address, db_entity.name, db_entity.id)
 
     return db_entity
 
@@ -268,8 +390,13 @@ async def delete_entity(
         raise HTTPException(status_code=404, detail="Entity not found")
 
     # Update device data in ble scanner
-    scanner = cast(VictronScanner, request.state.victron_scanner)
-    scanner.remove_entity(db_entity.sensor.address, db_entity.name)
+    scanner = cast(
+        "VictronScanner | None",
+        get_plugin(request, "victron_scanner", required=False),
+    )
+    if scanner is not None:
+        scanner.remove_entity(db_entity.sensor.address, db_entity.name)
+    grouped_states_cache.invalidate(entity_id)
 
     db.delete(db_entity)
     db.commit()
@@ -277,6 +404,29 @@ async def delete_entity(
     return {"message": f"entity {entity_id} removed."}
 
 
+def query_states(
+    db: Session,
+    entity_id: int,
+    skip: int,
+    limit: int,
+    after: datetime | None,
+    downsample: str | None,
+    points: int,
+):
+    if downsample is None:
+        return crud.get_states(
+            db, entity_id=entity_id, skip=skip, limit=limit, after=after
+        )
+
+    if after is None:
+        after = datetime.now() - timedelta(hours=settings.downsample_default_window)
+    db_states = crud.get_states(db, entity_id=entity_id, limit=None, after=after)
+    try:
+        return downsample_states(db_states, downsample, points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @app.get(
     "/entities/{entity_id}/states",
     response_model=list[schemas.State],
@@ -284,15 +434,27 @@ async def delete_entity(
     response_model_exclude=["entity_id", "entity_name"],
 )
 def read_states(
-    entity_id: int, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
+    entity_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    after: datetime | None = None,
+    downsample: Literal["lttb", "minmax"] | None = None,
+    points: int = Query(500, ge=3),
+    db: Session = Depends(get_db),
 ):
+    """
+    Get the states of an entity.
+
+    Without `downsample` states are paged with `skip` and `limit`. With
+    `downsample=lttb|minmax` all states after `after` (by default the last
+    `downsample_default_window` hours) are reduced to at most `points`
+    samples that keep the visual shape (lttb) or every spike (minmax).
+    """
     db_entity = crud.get_entity(db, entity_id)
     if db_entity is None:
         raise HTTPException(status_code=404, detail="Entity not found")
 
-    db_states = crud.get_states(db, entity_id=entity_id, skip=skip, limit=limit)
-
-    return db_states
+    return query_states(db, entity_id, skip, limit, after, downsample, points)
 
 
 @app.get(
@@ -303,6 +465,7 @@ def read_grouped_states(
     entity_id: int,
     period: str = "4h",
     samples: int = 100,
+    intervals: bool = False,
     db: Session = Depends(get_db),
 ):
     """
@@ -312,82 +475,139 @@ def read_grouped_states(
     - entity_id: The ID of the entity to get states for
     - period: Resampling period (e.g., '4h', '1d', '30min')
     - samples: Number of samples to return
+    - intervals: Return non-numeric data as (start, end, state) intervals
+      with per period time-in-state percentages instead of raw timestamps
     """
     db_entity = crud.get_entity(db, entity_id)
     if db_entity is None:
         raise HTTPException(status_code=404, detail="Entity not found")
 
     try:
-        # Create a date range with the specified frequency
-        now = datetime.now()
-        date_range = pd.date_range(end=now, periods=samples, freq=period)
-        after = date_range[0]
-    except Exception as e:
+        is_numeric, data = read_grouped_data(db, entity_id, period, samples, intervals)
+    except ValueError as e:
         logger.warning(
             f"Failed to parse period '{period}': {e}. Using default calculation."
         )
         raise HTTPException(status_code=404, detail="Could not calculate data range")
 
-    # Get states using the after parameter and a much higher limit
-    # Use limit=0 to remove the limit completely, or a very high number
-    db_states = crud.get_states(db, entity_id=entity_id, after=after, limit=10000)
-
-    if not db_states:
-        return {
-            "is_numeric": False,
-            "entity_name": db_entity.name,
-            "unit": db_entity.unit,
-            "data": [],
-        }
-
-    # Convert to DataFrame
-    data = [(s.created, s.state) for s in db_states]
-    states_df = pd.DataFrame(data, columns=["created", "state"])
-    states_df["created"] = pd.to_datetime(states_df["created"])
-    states_df = states_df.set_index("created")
-
-    # Determine if data is numeric
-    is_numeric = True
-    try:
-        states_df["state"] = pd.to_numeric(states_df["state"])
-    except ValueError:
-        is_numeric = False
-        states_df["state"] = states_df["state"].astype(str)
-
-    result = {
+    return {
         "is_numeric": is_numeric,
         "entity_name": db_entity.name,
         "unit": db_entity.unit,
+        "data": data,
     }
 
-    if is_numeric:
-        # Resample numeric data
-        resampled_df = (
-            states_df.resample(period).agg({"state": ["min", "max", "mean"]}).dropna()
+
+@app.get("/grouped_states/cache", response_model=dict)
+def read_grouped_states_cache_stats():
+    """Size and hit-ratio of the grouped states cache."""
+    return grouped_states_cache.stats()
+
+
+@app.get("/ble/stats", response_model=dict)
+async def read_ble_stats(request: Request):
+    """Advertisements seen, routed and dropped, and BTHome packet-id filtering."""
+    api_bleak_scanner = cast(
+        "ApiBleakScanner", get_plugin(request, "api_bleak_scanner")
+    )
+    bthome_scanner = cast(
+        "BTHomeScanner | None",
+        get_plugin(request, "bthome_scanner", required=False),
+    )
+    stats = api_bleak_scanner.stats()
+    if bthome_scanner is not None:
+        stats["bthome"] = bthome_scanner.scanner.stats()
+    return stats
+
+
+@app.get("/metrics")
+async def read_metrics():
+    """Counters, gauges and histograms in the Prometheus text format."""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/admin/loop", response_model=dict)
+def read_loop_stats(request: Request, top: int = 10):
+    """
+    Event loop lag histogram and, with `loop_slow_callback_threshold` set,
+    the `top` call sites that held the loop longest with a sample stack.
+    """
+    loop_monitor = cast(LoopMonitor, request.state.loop_monitor)
+    return loop_monitor.stats(top)
+
+
+@app.delete("/admin/loop", response_model=dict)
+def reset_loop_stats(request: Request):
+    """Forget the recorded stalls and maximum lag."""
+    loop_monitor = cast(LoopMonitor, request.state.loop_monitor)
+    loop_monitor.reset()
+    return {"message": "Loop statistics reset."}
+
+
+@app.get("/admin/profile")
+async def profile_service(
+    duration: float = 10.0,
+    interval: float = 0.01,
+    format: Literal["summary", "collapsed"] = "summary",
+    top: int = 25,
+):
+    """
+    Sample the stacks of all threads for `duration` seconds while the
+    service keeps running. `summary` ranks functions per thread,
+    `collapsed` returns folded stacks for flame graph tools. The duration
+    is capped by `profile_max_duration`; one profile runs at a time.
+    """
+    if duration <= 0 or interval <= 0:
+        raise HTTPException(
+            status_code=400, detail="duration and interval must be positive"
         )
+    try:
+        sampler = await profile(duration, interval)
+    except RuntimeError as ex:
+        raise HTTPException(status_code=409, detail=str(ex))
 
-        # Format for response
-        result["data"] = {
-            "timestamps": resampled_df.index.strftime("%Y-%m-%dT%H:%M:%S").tolist(),
-            "min": resampled_df["state"]["min"].tolist(),
-            "max": resampled_df["state"]["max"].tolist(),
-            "mean": resampled_df["state"]["mean"].tolist(),
-        }
-    else:
-        # For string data, group by unique values
-        unique_states = states_df["state"].unique().tolist()
-        result["data"] = {"unique_states": unique_states, "state_data": []}
-
-        for state in unique_states:
-            state_df = states_df[states_df["state"] == state]
-            result["data"]["state_data"].append(
-                {
-                    "state": state,
-                    "timestamps": state_df.index.strftime("%Y-%m-%dT%H:%M:%S").tolist(),
-                }
-            )
+    if format == "collapsed":
+        return Response(sampler.collapsed(), media_type="text/plain")
+    return sampler.summary(top)
+
+
+@app.get("/startup", response_model=dict)
+def read_startup_report():
+    """Import and init time per component of the last startup."""
+    return startup_report.as_dict()
+
+
+@app.get("/scheduler/stats", response_model=dict)
+async def read_scheduler_stats(request: Request):
+    """Runs, failures, restarts and run times of the periodic jobs."""
+    scheduler = cast(Scheduler, request.state.scheduler)
+    return {**scheduler.stats(), "sampling": entity_sampler.stats()}
+
+
+@app.get("/hymer/stats", response_model=dict)
+async def read_hymer_stats(request: Request):
+    """Request queue, retry and latency statistics of the camper board link."""
+    hymer_serial = cast("HymerSerial", get_plugin(request, "hymer_serial"))
+    return hymer_serial.stats()
 
-    return result
+
+@app.get("/hymer/link", response_model=dict)
+async def read_hymer_link(request: Request):
+    """Serial link health: frame rate, CRC failures, NACKs and reconnects."""
+    hymer_serial = cast("HymerSerial", get_plugin(request, "hymer_serial"))
+    return hymer_serial.link_stats()
+
+
+@app.get("/single_flight/stats", response_model=dict)
+async def read_single_flight_stats(request: Request):
+    """Counters of calls that were coalesced into an in-flight identical call."""
+    hymer_serial = cast(
+        "HymerSerial | None", get_plugin(request, "hymer_serial", required=False)
+    )
+    stats = {"grouped_states": grouped_states_flight.stats()}
+    if hymer_serial is not None:
+        stats["hymer_serial"] = hymer_serial.single_flight.stats()
+    return stats
 
 
 @app.post(
@@ -413,6 +633,7 @@ def read_grouped_states_by_name(
     target_entity_name: str,
     period: str = "4h",
     samples: int = 100,
+    intervals: bool = False,
     db: Session = Depends(get_db),
 ):
     """
@@ -431,7 +652,63 @@ def read_grouped_states_by_name(
         )
 
     # Reuse the existing endpoint with the entity ID
-    return read_grouped_states(db_entity.id, period, samples, db)
+    return read_grouped_states(db_entity.id, period, samples, intervals, db)
+
+
+@app.post("/grouped_states_by_names", response_model=dict)
+def read_grouped_states_by_names(
+    query: schemas.GroupedStatesQuery,
+    db: Session = Depends(get_db),
+):
+    """
+    Get historical state data of several entities grouped by shared time periods.
+
+    All entities are resolved and fetched in one query each; numeric series
+    are aligned to the returned `timestamps`.
+    """
+    names = [(e.sensor, e.entity) for e in query.entities]
+    db_entities = {
+        (sensor_name, e.name): e
+        for sensor_name, e in crud.get_entities_by_names(db, names)
+    }
+
+    missing = [
+        f"{sensor}/{entity}"
+        for sensor, entity in names
+        if (sensor, entity) not in db_entities
+    ]
+    if missing:
+        raise HTTPException(
+            status_code=404, detail=f"Entities {', '.join(missing)} not found"
+        )
+
+    try:
+        timestamps, results = read_grouped_data_multi(
+            db,
+            [db_entities[name].id for name in names],
+            query.period,
+            query.samples,
+            query.intervals,
+        )
+    except ValueError as e:
+        logger.warning(f"Failed to parse period '{query.period}': {e}.")
+        raise HTTPException(status_code=404, detail="Could not calculate data range")
+
+    series = []
+    for sensor, entity in names:
+        db_entity = db_entities[(sensor, entity)]
+        is_numeric, data = results[db_entity.id]
+        series.append(
+            {
+                "sensor_name": sensor,
+                "entity_name": db_entity.name,
+                "unit": db_entity.unit,
+                "is_numeric": is_numeric,
+                "data": data,
+            }
+        )
+
+    return {"timestamps": timestamps, "series": series}
 
 
 @app.post(
@@ -445,6 +722,9 @@ async def states_by_sensor_and_entity_name(
     target_entity_name: str,
     skip: int = 0,
     limit: int = 100,
+    after: datetime | None = None,
+    downsample: Literal["lttb", "minmax"] | None = None,
+    points: int = Query(500, ge=3),
     db: Session = Depends(get_db),
 ):
     db_sensor = crud.get_sensor_by_name(db, target_sensor_name)
@@ -459,9 +739,7 @@ async def states_by_sensor_and_entity_name(
             status_code=404, detail=f"Entity {target_entity_name} not found"
         )
 
-    db_states = crud.get_states(db, entity_id=db_entity.id, skip=skip, limit=limit)
-
-    return db_states
+    return query_states(db, db_entity.id, skip, limit, after, downsample, points)
 
 
 @app.post("/action/{target_entity_id}", response_model=dict)
@@ -475,7 +753,7 @@ async def execute_action(
     if db_entity is None:
         raise HTTPException(status_code=404, detail="Entity not found")
 
-    hymer_serial = cast(HymerSerial, request.state.hymer_serial)
+    hymer_serial = cast("HymerSerial", get_plugin(request, "hymer_serial"))
 
     match db_entity.name:
         case "household_state":
@@ -514,7 +792,7 @@ async def execute_action_by_name(
             status_code=404, detail=f"Entity {target_entity_name} not found"
         )
 
-    hymer_serial = cast(HymerSerial, request.state.hymer_serial)
+    hymer_serial = cast("HymerSerial", get_plugin(request, "hymer_serial"))
 
     match db_entity.name:
         case "household_state":
@@ -1,6 +1,6 @@
 from asyncio import Lock
 from dataclasses import dataclass
-from typing import Dict, Optional, ClassVar
+from typing import Dict, List, Optional, ClassVar
 from datetime import datetime, timedelta
 
 from .config import settings
@@ -45,6 +45,40 @@ class InMemoryBackend:
         async with self._lock:
             self._store[key] = Value(data_str, created, stored)
 
+    async def set_many(
+        self, items: Dict[str, str], created: datetime, store_before: datetime
+    ) -> Dict[str, Optional[datetime]]:
+        """
+        Set several keys under one lock acquisition.
+
+        Keys that are new or were last stored before `store_before` are marked
+        stored at `created` and returned with their previous stored time; the
+        caller persists those, or puts the marks back with `restore_stored`
+        when that fails. Unchanged values only get their `created` timestamp
+        refreshed.
+        """
+        due = {}
+        async with self._lock:
+            for key, data_str in items.items():
+                v = self._get(key)
+                if v and v.stored > store_before:
+                    if v.data_str == data_str:
+                        v.created = created
+                    else:
+                        self._store[key] = Value(data_str, created, v.stored)
+                else:
+                    due[key] = v.stored if v else None
+                    self._store[key] = Value(data_str, created, created)
+        return due
+
+    async def restore_stored(self, previous: Dict[str, Optional[datetime]]) -> None:
+        """Undo set_many's stored marks; never stored keys become due."""
+        async with self._lock:
+            for key, stored in previous.items():
+                v = self._store.get(key)
+                if v:
+                    v.stored = stored or datetime.min
+
     async def clear(self, key: Optional[str] = None) -> int:
         count = 0
         del self._store[key]
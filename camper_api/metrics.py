@@ -0,0 +1,183 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class Histogram:
+    """Fixed-bucket histogram; a value is counted in the first bucket >= value."""
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    @contextmanager
+    def timer(self):
+        """Observe the duration of the `with` block in seconds."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self) -> dict:
+        """Cumulative bucket counts keyed by upper bound, like Prometheus `le`."""
+        cumulative = 0
+        buckets = {}
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            buckets["+Inf" if bound == float("inf") else str(bound)] = cumulative
+        return {"buckets": buckets, "count": self.count, "sum": self.sum}
+
+
+class Value:
+    """A counter or gauge sample."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+
+def _format(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class MetricFamily:
+    """A named metric with one sample (Value or Histogram) per label set."""
+
+    def __init__(
+        self,
+        kind: str,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...],
+        factory: Callable[[], Value | Histogram],
+    ):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._factory = factory
+        self._children: dict[tuple[str, ...], Value | Histogram] = {}
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} takes labels {self.labelnames}")
+            child = self._children[values] = self._factory()
+        return child
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {_escape(self.documentation)}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for values, child in self._children.items():
+            labels = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+            if isinstance(child, Histogram):
+                cumulative = 0
+                for bound, count in zip(child.buckets + (float("inf"),), child.counts):
+                    cumulative += count
+                    le = ",".join(labels + [f'le="{_format(bound)}"'])
+                    lines.append(f"{self.name}_bucket{{{le}}} {cumulative}")
+                suffix = "{" + ",".join(labels) + "}" if labels else ""
+                lines.append(f"{self.name}_sum{suffix} {_format(child.sum)}")
+                lines.append(f"{self.name}_count{suffix} {child.count}")
+            else:
+                suffix = "{" + ",".join(labels) + "}" if labels else ""
+                lines.append(f"{self.name}{suffix} {_format(child.value)}")
+        return lines
+
+
+class Registry:
+    """
+    Counters, gauges and histograms rendered in the Prometheus text format.
+
+    Metrics are plain attributes updated in place, so instrumented code pays
+    an increment or a bisect per event; formatting only happens when scraped.
+    Collectors run just before rendering to copy values kept elsewhere, such
+    as plugin statistics, into gauges.
+
+    A metric without label names is returned as its single sample, otherwise
+    as a family to pick samples from with `labels(...)`. Asking for an
+    existing name returns the existing metric.
+    """
+
+    def __init__(self):
+        self._families: dict[str, MetricFamily] = {}
+        self._collectors: list[Callable[[], None]] = []
+
+    def _family(self, kind, name, documentation, labelnames, factory):
+        family = self._families.get(name)
+        if family is None:
+            family = MetricFamily(kind, name, documentation, labelnames, factory)
+            self._families[name] = family
+        elif family.kind != kind or family.labelnames != labelnames:
+            raise ValueError(f"{name} is already registered as another metric")
+        return family.labels() if not labelnames else family
+
+    def counter(self, name: str, documentation: str, labelnames=()):
+        return self._family("counter", name, documentation, tuple(labelnames), Value)
+
+    def gauge(self, name: str, documentation: str, labelnames=()):
+        return self._family("gauge", name, documentation, tuple(labelnames), Value)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames=(),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        return self._family(
+            "histogram",
+            name,
+            documentation,
+            tuple(labelnames),
+            lambda: Histogram(buckets),
+        )
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        if collector not in self._collectors:
+            self._collectors.append(collector)
+
+    def remove_collector(self, collector: Callable[[], None]) -> None:
+        if collector in self._collectors:
+            self._collectors.remove(collector)
+
+    def render(self) -> str:
+        for collector in self._collectors:
+            collector()
+        lines = []
+        for family in self._families.values():
+            lines += family.render()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
@@ -0,0 +1,60 @@
+import time
+
+
+class _Ring:
+    __slots__ = ("hashes", "times", "pos")
+
+    def __init__(self, depth: int):
+        self.hashes: list[int | None] = [None] * depth
+        self.times = [0.0] * depth
+        self.pos = 0
+
+
+class AdvertDedup:
+    """
+    Per-device filter for repeated BLE advertisement payloads.
+
+    Every address keeps the hashes of its last `depth` distinct payloads in a
+    fixed-size ring. A payload matching one of them is a duplicate unless it
+    was first seen more than `max_age` seconds ago, so a device repeating an
+    unchanged reading still gets through once in a while.
+    """
+
+    def __init__(self, depth: int, max_age: float):
+        self.depth = depth
+        self.max_age = max_age
+        self._rings: dict[str, _Ring] = {}
+        self.accepted = 0
+        self.duplicates = 0
+
+    def is_duplicate(self, address: str, payload: bytes) -> bool:
+        ring = self._rings.get(address)
+        if ring is None:
+            ring = self._rings[address] = _Ring(self.depth)
+
+        now = time.monotonic()
+        payload_hash = hash(payload)
+        try:
+            i = ring.hashes.index(payload_hash)
+        except ValueError:
+            i = ring.pos
+            ring.hashes[i] = payload_hash
+            ring.pos = (i + 1) % self.depth
+        else:
+            if now - ring.times[i] < self.max_age:
+                self.duplicates += 1
+                return True
+
+        ring.times[i] = now
+        self.accepted += 1
+        return False
+
+    def forget(self, address: str) -> None:
+        self._rings.pop(address, None)
+
+    def stats(self) -> dict:
+        return {
+            "devices": len(self._rings),
+            "accepted": self.accepted,
+            "duplicates": self.duplicates,
+        }
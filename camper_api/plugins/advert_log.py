@@ -0,0 +1,126 @@
+import struct
+import uuid
+from functools import lru_cache
+from typing import BinaryIO, Iterator, NamedTuple
+
+MAGIC = b"CAMPADV1"
+
+# timestamp, rssi, address length, manufacturer entries, service entries
+_RECORD = struct.Struct("<dbBBB")
+_MANUFACTURER = struct.Struct("<HH")  # company id, data length
+_SERVICE = struct.Struct("<16sH")  # uuid, data length
+
+
+class AdvertRecord(NamedTuple):
+    timestamp: float
+    address: str
+    rssi: int | None
+    manufacturer_data: dict[int, bytes]
+    service_data: dict[str, bytes]
+
+
+@lru_cache(maxsize=256)
+def _uuid_bytes(service_uuid: str) -> bytes:
+    return uuid.UUID(service_uuid).bytes
+
+
+@lru_cache(maxsize=256)
+def _uuid_str(service_uuid: bytes) -> str:
+    return str(uuid.UUID(bytes=service_uuid))
+
+
+class AdvertLogWriter:
+    """
+    Append BLE advertisements to a compact binary log.
+
+    Each record is a fixed header (timestamp, rssi and entry counts) followed
+    by the address and the length-prefixed manufacturer and service data.
+    A missing rssi is stored as -128. Once the log holds `max_bytes`, `full`
+    is set and the owner is expected to close it.
+    """
+
+    def __init__(self, path: str, max_bytes: int | None = None):
+        self.path = path
+        self.records = 0
+        self.max_bytes = max_bytes
+        self._file: BinaryIO = open(path, "ab", buffering=64 * 1024)
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self.size = self._file.tell()
+
+    @property
+    def full(self) -> bool:
+        return self.max_bytes is not None and self.size >= self.max_bytes
+
+    def write(
+        self,
+        timestamp: float,
+        address: str,
+        rssi: int | None,
+        manufacturer_data: dict[int, bytes],
+        service_data: dict[str, bytes],
+    ) -> None:
+        address_bytes = address.encode()
+        rssi = -128 if rssi is None else max(-127, min(127, rssi))
+        parts = [
+            _RECORD.pack(
+                timestamp,
+                rssi,
+                len(address_bytes),
+                len(manufacturer_data),
+                len(service_data),
+            ),
+            address_bytes,
+        ]
+        for company_id, data in manufacturer_data.items():
+            parts += (_MANUFACTURER.pack(company_id, len(data)), data)
+        for service_uuid, data in service_data.items():
+            parts += (_SERVICE.pack(_uuid_bytes(service_uuid), len(data)), data)
+        record = b"".join(parts)
+        self._file.write(record)
+        self.records += 1
+        self.size += len(record)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def read_advert_log(path: str) -> Iterator[AdvertRecord]:
+    with open(path, "rb") as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{path} is not a BLE advertisement log")
+
+    pos = len(MAGIC)
+    while pos < len(data):
+        timestamp, rssi, address_length, manufacturers, services = _RECORD.unpack_from(
+            data, pos
+        )
+        pos += _RECORD.size
+        address = data[pos : pos + address_length].decode()
+        pos += address_length
+
+        manufacturer_data = {}
+        for _ in range(manufacturers):
+            company_id, length = _MANUFACTURER.unpack_from(data, pos)
+            pos += _MANUFACTURER.size
+            manufacturer_data[company_id] = data[pos : pos + length]
+            pos += length
+
+        service_data = {}
+        for _ in range(services):
+            service_uuid, length = _SERVICE.unpack_from(data, pos)
+            pos += _SERVICE.size
+            service_data[_uuid_str(service_uuid)] = data[pos : pos + length]
+            pos += length
+
+        yield AdvertRecord(
+            timestamp,
+            address,
+            None if rssi == -128 else rssi,
+            manufacturer_data,
+            service_data,
+        )
@@ -1,26 +1,225 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable
+
 from bleak import BleakScanner
 from bleak.backends.device import BLEDevice
 from bleak.backends.scanner import AdvertisementData
 
+from ..metrics import REGISTRY
+from .advert_log import AdvertLogWriter
+
+logger = logging.getLogger("uvicorn.camper-api.api_bleak_scanner")
+
+RATE_INTERVAL = 10  # seconds
+
+DetectionCallback = Callable[[BLEDevice, AdvertisementData], None]
+
+
+@dataclass(slots=True)
+class Route:
+    callback: DetectionCallback
+    manufacturer_id: int | None = None
+    service_uuid: str | None = None
+    plugin: str = ""
+    delivered: int = 0
+
+    def matches(self, advertisement: AdvertisementData) -> bool:
+        if (
+            self.manufacturer_id is not None
+            and self.manufacturer_id not in advertisement.manufacturer_data
+        ):
+            return False
+        if (
+            self.service_uuid is not None
+            and self.service_uuid not in advertisement.service_data
+        ):
+            return False
+        return True
+
 
 class ApiBleakScanner:
+    """
+    Shared BLE scanner that routes advertisements to the plugins.
+
+    Plugins register interest per device address, optionally narrowed to a
+    manufacturer id or service UUID, so advertisements from unrelated devices
+    are dropped with a single dict lookup. Callbacks added with
+    `add_callback` still receive every advertisement.
+
+    While recording, every advertisement is also appended to a binary log
+    that benchmarks/replay_adverts.py can feed back without a radio. The log
+    is flushed every RATE_INTERVAL and recording stops at its size limit.
+    """
+
     def __init__(self):
         self._scanner: BleakScanner = BleakScanner(
             detection_callback=self.detection_callback
         )
         self._callbacks = []
+        self._routes: dict[str, list[Route]] = {}
+        self._recorder: AdvertLogWriter | None = None
+
+        self.seen = 0
+        self.routed = 0
+        self.dropped = 0
+        self.rates = {"seen_per_s": 0.0, "routed_per_s": 0.0, "dropped_per_s": 0.0}
+        self._rate_handle: asyncio.Task | None = None
+
+        self._adverts = REGISTRY.counter(
+            "camper_ble_adverts_total",
+            "BLE advertisements received, by routing result",
+            ("result",),
+        )
+        self._delivered = REGISTRY.counter(
+            "camper_ble_adverts_delivered_total",
+            "BLE advertisements delivered to a plugin",
+            ("plugin",),
+        )
+        self._delivered_by_removed: dict[str, int] = {}
 
     def detection_callback(
         self, ble_device: BLEDevice, advertisement: AdvertisementData
     ):
+        self.seen += 1
+        routed = False
+
+        if self._recorder is not None:
+            self._recorder.write(
+                time.time(),
+                ble_device.address,
+                advertisement.rssi,
+                advertisement.manufacturer_data,
+                advertisement.service_data,
+            )
+            if self._recorder.full:
+                logger.warning(
+                    "BLE recording %s reached %d bytes, stopped recording",
+                    self._recorder.path,
+                    self._recorder.size,
+                )
+                self.stop_recording()
+
+        routes = self._routes.get(ble_device.address.upper())
+        if routes is not None:
+            for route in routes:
+                if route.matches(advertisement):
+                    route.callback(ble_device, advertisement)
+                    route.delivered += 1
+                    routed = True
+
         for callback in self._callbacks:
             callback(ble_device, advertisement)
+            routed = True
+
+        if routed:
+            self.routed += 1
+        else:
+            self.dropped += 1
 
     async def start(self):
+        REGISTRY.add_collector(self._collect_metrics)
+        self._rate_handle = asyncio.create_task(self._rate_task())
         await self._scanner.start()
 
     async def stop(self):
+        REGISTRY.remove_collector(self._collect_metrics)
         await self._scanner.stop()
+        if self._rate_handle is not None:
+            self._rate_handle.cancel()
+        self.stop_recording()
+
+    def start_recording(self, path: str, max_bytes: int | None = None) -> None:
+        self.stop_recording()
+        self._recorder = AdvertLogWriter(path, max_bytes)
+
+    def stop_recording(self) -> None:
+        if self._recorder is not None:
+            self._recorder.close()
+            self._recorder = None
 
     def add_callback(self, callback):
         self._callbacks.append(callback)
+
+    def add_route(
+        self,
+        address: str,
+        callback: DetectionCallback,
+        plugin: str,
+        manufacturer_id: int | None = None,
+        service_uuid: str | None = None,
+    ) -> None:
+        """Deliver advertisements of `address` to `callback` of `plugin`."""
+        self._routes.setdefault(address.upper(), []).append(
+            Route(
+                callback,
+                manufacturer_id,
+                service_uuid.lower() if service_uuid else None,
+                plugin,
+            )
+        )
+
+    def remove_route(self, address: str, callback: DetectionCallback) -> None:
+        address = address.upper()
+        for route in self._routes.get(address, ()):
+            if route.callback == callback:
+                self._delivered_by_removed[route.plugin] = (
+                    self._delivered_by_removed.get(route.plugin, 0) + route.delivered
+                )
+        routes = [r for r in self._routes.get(address, ()) if r.callback != callback]
+        if routes:
+            self._routes[address] = routes
+        else:
+            self._routes.pop(address, None)
+
+    def stats(self) -> dict:
+        return {
+            "seen": self.seen,
+            "routed": self.routed,
+            "dropped": self.dropped,
+            **self.rates,
+            "recording": (
+                {
+                    "path": self._recorder.path,
+                    "records": self._recorder.records,
+                    "bytes": self._recorder.size,
+                }
+                if self._recorder is not None
+                else None
+            ),
+            "routes": {
+                address: len(routes) for address, routes in self._routes.items()
+            },
+        }
+
+    def _collect_metrics(self) -> None:
+        self._adverts.labels("routed").set(self.routed)
+        self._adverts.labels("dropped").set(self.dropped)
+        delivered = dict(self._delivered_by_removed)
+        for routes in self._routes.values():
+            for route in routes:
+                delivered[route.plugin] = (
+                    delivered.get(route.plugin, 0) + route.delivered
+                )
+        for plugin, count in delivered.items():
+            self._delivered.labels(plugin).set(count)
+
+    async def _rate_task(self) -> None:
+        loop = asyncio.get_running_loop()
+        mark_time = loop.time()
+        mark = (self.seen, self.routed, self.dropped)
+        while True:
+            await asyncio.sleep(RATE_INTERVAL)
+            now = loop.time()
+            counts = (self.seen, self.routed, self.dropped)
+            self.rates = {
+                f"{name}_per_s": (count - previous) / (now - mark_time)
+                for name, count, previous in zip(
+                    ("seen", "routed", "dropped"), counts, mark
+                )
+            }
+            mark_time, mark = now, counts
+            if self._recorder is not None:
+                self._recorder.flush()
@@ -1,10 +1,13 @@
 import asyncio
-from typing import Set, Any
+from dataclasses import dataclass
+from typing import Set, Any, Callable
 from datetime import datetime, timezone
 import struct
 from bleak.backends.device import BLEDevice
 from bleak.backends.scanner import AdvertisementData
-from .bthome_const import MEAS_TYPES
+from .bthome_const import MEAS_TYPES, MeasTypes
+from .advert_dedup import AdvertDedup
+from ..config import settings
 
 import time
 import logging
@@ -12,6 +15,8 @@ import logging
 
 logger = logging.getLogger("uvicorn.camper-api.bthome_ble")
 
+BTHOME_SERVICE_UUID = "0000fcd2-0000-1000-8000-00805f9b34fb"
+
 
 def short_address(address: str) -> str:
     """Convert a Bluetooth address to a short address."""
@@ -26,46 +31,65 @@ def to_mac(addr: bytes) -> str:
     return ":".join(f"{i:02X}" for i in addr)
 
 
-def parse_uint(data_obj: bytes, factor: float = 1.0) -> float:
-    """Convert bytes (as unsigned integer) and factor to float."""
-    decimal_places = -int(f"{factor:e}".split("e")[-1])
-    return round(
-        int.from_bytes(data_obj, "little", signed=False) * factor, decimal_places
-    )
+DATA_FORMATS = {
+    0: "unsigned_integer",
+    1: "signed_integer",
+    2: "float",
+    3: "string",
+    4: "raw",
+    5: "timestamp",
+}
+INT_FORMATS = {1: "B", 2: "H", 4: "I", 8: "Q"}
+FLOAT_FORMATS = {2: "e", 4: "f", 8: "d"}
+
+
+@dataclass(frozen=True, slots=True)
+class ObjectDecoder:
+    state_name: str
+    unit: str
+    length: int | None  # None: a length byte precedes the data
+    decode: Callable[[memoryview, int, int], Any]  # (buffer, start, end)
 
 
-def parse_int(data_obj: bytes, factor: float = 1.0) -> float:
-    """Convert bytes (as signed integer) and factor to float."""
+def _int_decoder(length: int, signed: bool, factor: float):
     decimal_places = -int(f"{factor:e}".split("e")[-1])
-    return round(
-        int.from_bytes(data_obj, "little", signed=True) * factor, decimal_places
+    code = INT_FORMATS.get(length)
+    if code is None:
+
+        def decode(buf, start, end):
+            value = int.from_bytes(buf[start:end], "little", signed=signed)
+            return round(value * factor, decimal_places)
+
+        return decode
+
+    unpack_from = struct.Struct("<" + (code.lower() if signed else code)).unpack_from
+    if type(factor) is int and factor == 1:
+        return lambda buf, start, end: unpack_from(buf, start)[0]
+    return lambda buf, start, end: round(
+        unpack_from(buf, start)[0] * factor, decimal_places
     )
 
 
-def parse_float(data_obj: bytes, factor: float = 1.0) -> float | None:
-    """Convert bytes (as float) and factor to float."""
+def _float_decoder(length: int, factor: float):
     decimal_places = -int(f"{factor:e}".split("e")[-1])
-    if len(data_obj) == 2:
-        [val] = struct.unpack("e", data_obj)
-    elif len(data_obj) == 4:
-        [val] = struct.unpack("f", data_obj)
-    elif len(data_obj) == 8:
-        [val] = struct.unpack("d", data_obj)
-    else:
-        logger.error("only 2, 4 or 8 byte long floats are supported in BTHome BLE")
-        return None
-    return round(val * factor, decimal_places)
+    code = FLOAT_FORMATS.get(length)
+    if code is None:
+
+        def decode(buf, start, end):
+            logger.error("only 2, 4 or 8 byte long floats are supported in BTHome BLE")
+            return None
 
+        return decode
 
-def parse_raw(data_obj: bytes) -> str | None:
-    """Convert bytes to raw hex string."""
-    return data_obj.hex()
+    unpack_from = struct.Struct("<" + code).unpack_from
+    return lambda buf, start, end: round(
+        unpack_from(buf, start)[0] * factor, decimal_places
+    )
 
 
-def parse_string(data_obj: bytes) -> str | None:
-    """Convert bytes to string."""
+def _string_decoder(buf, start, end):
     try:
-        return data_obj.decode("UTF-8")
+        return str(buf[start:end], "UTF-8")
     except UnicodeDecodeError:
         logger.error(
             "BTHome data contains bytes that can't be decoded to a string (use UTF-8 encoding)"
@@ -73,89 +97,167 @@ def parse_string(data_obj: bytes) -> str | None:
         return None
 
 
-def parse_timestamp(data_obj: bytes) -> datetime:
-    """Convert bytes to a datetime object."""
-    value = datetime.fromtimestamp(
-        int.from_bytes(data_obj, "little", signed=False), tz=timezone.utc
+def _timestamp_decoder(buf, start, end):
+    return datetime.fromtimestamp(
+        int.from_bytes(buf[start:end], "little", signed=False), tz=timezone.utc
+    )
+
+
+def build_decoders(meas_types: dict[int, MeasTypes]) -> dict[int, ObjectDecoder]:
+    """Precompile the struct, scale and rounding of every BTHome object id."""
+    decoders = {}
+    for object_id, meas_type in meas_types.items():
+        data_format = DATA_FORMATS.get(meas_type.data_format, meas_type.data_format)
+        length = meas_type.data_length
+        if data_format == "unsigned_integer":
+            decode = _int_decoder(length, False, meas_type.factor)
+        elif data_format == "signed_integer":
+            decode = _int_decoder(length, True, meas_type.factor)
+        elif data_format == "float":
+            decode = _float_decoder(length, meas_type.factor)
+        elif data_format == "string":
+            decode, length = _string_decoder, None
+        elif data_format == "raw":
+            decode, length = (lambda buf, start, end: buf[start:end].hex()), None
+        elif data_format == "timestamp":
+            decode = _timestamp_decoder
+        else:
+            raise ValueError(f"Unknown BTHome data format {meas_type.data_format}")
+
+        decoders[object_id] = ObjectDecoder(
+            meas_type.state_name, str(meas_type.unit), length, decode
+        )
+    return decoders
+
+
+DECODERS = build_decoders(MEAS_TYPES)
+
+
+class DeviceState:
+    """Packet-id filter state and counters of one BTHome device."""
+
+    __slots__ = (
+        "last_packet_id",
+        "last_adv_time",
+        "mac_readable",
+        "sleepy_device",
+        "accepted",
+        "skipped",
     )
-    return value
+
+    def __init__(self) -> None:
+        self.last_packet_id: int | None = None
+        self.last_adv_time: float | None = None
+        self.mac_readable: str | None = None
+        self.sleepy_device: bool | None = None
+        self.accepted = 0
+        self.skipped = 0
 
 
 class BTHomeBaseScanner:
     def __init__(self, addresses: list[str], callback=None):
         self.addresses = [a.lower() for a in addresses]
-        self.last_packet_id = None
-        self.last_adv_time = None
-        self.last_packet_id = None
-        self.mac_readable = None
-        self.sleepy_device = None
+        self.devices: dict[str, DeviceState] = {
+            a: DeviceState() for a in self.addresses
+        }
         self.callback = callback
+        self.decoders = DECODERS
+        self.dedup = AdvertDedup(settings.ble_dedup_depth, settings.ble_dedup_max_age)
+
+    def register(self, router) -> None:
+        """Route BTHome advertisements of the configured addresses to this scanner."""
+        for address in self.addresses:
+            router.add_route(
+                address,
+                self.detection_callback,
+                "bthome_scanner",
+                service_uuid=BTHOME_SERVICE_UUID,
+            )
+
+    def stats(self) -> dict:
+        return {
+            address: {
+                "accepted": device.accepted,
+                "skipped": device.skipped,
+                "last_packet_id": device.last_packet_id,
+                "sleepy_device": device.sleepy_device,
+            }
+            for address, device in self.devices.items()
+        }
+
+    def _device(self, address: str) -> DeviceState:
+        device = self.devices.get(address.lower())
+        if device is None:
+            device = self.devices[address.lower()] = DeviceState()
+        return device
 
     def _skip_old_or_duplicated_advertisement(
-        self, new_packet_id: int, adv_time: float
+        self, device: DeviceState, new_packet_id: int, adv_time: float
     ) -> bool:
         # no history, first packet, don't discard packet
-        if self.last_packet_id is None or self.last_adv_time is None:
+        if device.last_packet_id is None or device.last_adv_time is None:
             logger.debug(
                 f"First packet, not filtering packet_id {new_packet_id}",
             )
             return False
 
         # more than 4 seconds since last packet, don't discard packet
-        if adv_time - self.last_adv_time > 4:
+        if adv_time - device.last_adv_time > 4:
             logger.debug(
                 "Not filtering packet_id, more than 4 seconds since last packet. "
-                f"New time: {adv_time}, Old time: {self.last_adv_time}"
+                f"New time: {adv_time}, Old time: {device.last_adv_time}"
             )
             return False
 
         # distance between new packet and old packet is less then 64
         if (
-            new_packet_id > self.last_packet_id
-            and new_packet_id - self.last_packet_id < 64
+            new_packet_id > device.last_packet_id
+            and new_packet_id - device.last_packet_id < 64
         ) or (
-            new_packet_id < self.last_packet_id
-            and new_packet_id + 256 - self.last_packet_id < 64
+            new_packet_id < device.last_packet_id
+            and new_packet_id + 256 - device.last_packet_id < 64
         ):
             return False
 
         # discard packet (new_packet_id=last_packet_id or older packet)
         logger.debug(
-            f"New packet_id {new_packet_id} indicates an older packet (previous packet_id {self.last_packet_id}). "
+            f"New packet_id {new_packet_id} indicates an older packet (previous packet_id {device.last_packet_id}). "
             "BLE advertisement will be skipped"
         )
         return True
 
     def _parse_payload(self, payload: bytes, adv_time: float, address: str):
+        device = self._device(address)
+        decoders = self.decoders
+        buf = memoryview(payload)
         payload_length = len(payload)
         next_obj_start = 0
         prev_obj_meas_type = 0
-        measurements: list[dict[str, Any]] = []
-        obj_data_format: str | int
+        meas_results = {}
 
-        # Create a list with all individual objects
+        # Decode the objects in a single pass
         while payload_length >= next_obj_start + 1:
             obj_start = next_obj_start
 
             # BTHome V2
-            obj_meas_type = payload[obj_start]
+            obj_meas_type = buf[obj_start]
             if prev_obj_meas_type > obj_meas_type:
                 logger.warning(
                     "BTHome device is not sending object ids in numerical order (from low "
                     "to high object id). This can cause issues with your BTHome receiver, "
                     f"payload: {payload.hex()}]"
                 )
-            if obj_meas_type not in MEAS_TYPES:
+            decoder = decoders.get(obj_meas_type)
+            if decoder is None:
                 logger.error(f"Invalid Object ID found in payload: {payload.hex()}")
                 break
             prev_obj_meas_type = obj_meas_type
-            obj_data_format = MEAS_TYPES[obj_meas_type].data_format
 
-            if obj_data_format in ["raw", "string"]:
-                obj_data_length = payload[obj_start + 1]
+            if decoder.length is None:
+                obj_data_length = buf[obj_start + 1]
                 obj_data_start = obj_start + 2
             else:
-                obj_data_length = MEAS_TYPES[obj_meas_type].data_length
+                obj_data_length = decoder.length
                 obj_data_start = obj_start + 1
             next_obj_start = obj_data_start + obj_data_length
 
@@ -169,71 +271,33 @@ class BTHomeBaseScanner:
                 logger.error(f"Invalid payload data length, payload: {payload.hex()}")
                 break
 
-            # Filter BLE advertisements with packet_id that has already been parsed.
+            value = decoder.decode(buf, obj_data_start, next_obj_start)
+
+            # Filter BLE advertisements with packet_id that has already been
+            # parsed. The packet id is the first object, so a duplicate is
+            # dropped before anything else is decoded.
             if obj_meas_type == 0:
-                new_packet_id = parse_uint(payload[obj_data_start:next_obj_start])
-                if self._skip_old_or_duplicated_advertisement(new_packet_id, adv_time):
+                if self._skip_old_or_duplicated_advertisement(device, value, adv_time):
+                    device.skipped += 1
                     break
-                self.last_packet_id = new_packet_id
-                self.last_adv_time = adv_time
-
-            measurements.append(
-                {
-                    "data format": obj_data_format,
-                    "data length": obj_data_length,
-                    "measurement type": obj_meas_type,
-                    "measurement data": payload[obj_data_start:next_obj_start],
-                    "device id": None,
-                }
-            )
-
-        # Parse each object into readable information
-        meas_results = {}
-        for meas in measurements:
-            if meas["measurement type"] not in MEAS_TYPES:
-                logger.error(
-                    f"UNKNOWN measurement type {meas['measurement type']} in BTHome BLE payload! Adv: {payload.hex()}"
-                )
-                continue
-
-            meas_type = MEAS_TYPES[meas["measurement type"]]
-            meas_factor = meas_type.factor
-
-            value: None | str | int | float | datetime
-            if meas["data format"] == 0 or meas["data format"] == "unsigned_integer":
-                value = parse_uint(meas["measurement data"], meas_factor)
-            elif meas["data format"] == 1 or meas["data format"] == "signed_integer":
-                value = parse_int(meas["measurement data"], meas_factor)
-            elif meas["data format"] == 2 or meas["data format"] == "float":
-                value = parse_float(meas["measurement data"], meas_factor)
-            elif meas["data format"] == 3 or meas["data format"] == "string":
-                value = parse_string(meas["measurement data"])
-            elif meas["data format"] == 4 or meas["data format"] == "raw":
-                value = parse_raw(meas["measurement data"])
-            elif meas["data format"] == 5 or meas["data format"] == "timestamp":
-                value = parse_timestamp(meas["measurement data"])
-            else:
-                logger.error(
-                    f"UNKNOWN dataobject in BTHome BLE payload! Adv: {payload.hex()}"
-                )
-                continue
+                device.last_packet_id = value
+                device.last_adv_time = adv_time
+                device.accepted += 1
 
             if value is not None:
-                if address not in meas_results:
-                    meas_results[address] = {}
-
-                meas_results[address][meas_type.state_name] = {
-                    "unit": str(meas_type.unit),
+                meas_results[decoder.state_name] = {
+                    "unit": decoder.unit,
                     "value": value,
-                    "state_name": meas_type.state_name,
+                    "state_name": decoder.state_name,
                 }
 
-        return meas_results
+        return {address: meas_results} if meas_results else {}
 
     def _parse_bthome_v2(
         self, service_info: BLEDevice, service_data: bytes, adv_time: float
     ):
         adv_info = service_data[0]
+        device = self._device(service_info.address)
 
         # Determine if encryption is used
         encryption = adv_info & (1 << 0)  # bit 0
@@ -245,14 +309,14 @@ class BTHomeBaseScanner:
         mac_included = adv_info & (1 << 1)  # bit 1
         if mac_included:
             bthome_mac_reversed = service_data[1:7]
-            self.mac_readable = to_mac(bthome_mac_reversed[::-1])
+            device.mac_readable = to_mac(bthome_mac_reversed[::-1])
             payload = service_data[7:]
         else:
-            self.mac_readable = service_info.address
+            device.mac_readable = service_info.address
             payload = service_data[1:]
 
         # If True, the device is only updating when triggered
-        self.sleepy_device = bool(adv_info & (1 << 2))  # bit 2
+        device.sleepy_device = bool(adv_info & (1 << 2))  # bit 2
 
         # Check BTHome version
         sw_version = (adv_info >> 5) & 7  # 3 bits (5-7)
@@ -267,7 +331,9 @@ class BTHomeBaseScanner:
     def detection_callback(self, device: BLEDevice, advertisement: AdvertisementData):
         if device.address.lower() in self.addresses:
             for uuid, service_data in advertisement.service_data.items():
-                if uuid.lower() == "0000fcd2-0000-1000-8000-00805f9b34fb":
+                if uuid.lower() == BTHOME_SERVICE_UUID:
+                    if self.dedup.is_duplicate(device.address.lower(), service_data):
+                        continue
                     meas_results = self._parse_bthome_v2(
                         device, service_data, time.time()
                     )
@@ -1,9 +1,10 @@
-import asyncio
 import logging
+import time
 
 from ..config import settings
 from ..database import get_db
 from .. import crud, schemas
+from ..scheduler import entity_sampler
 from .bthome_bleak import BTHomeBaseScanner
 
 logger = logging.getLogger("uvicorn.camper-api.bthome_scanner")
@@ -15,22 +16,18 @@ class BTHomeScanner:
         self.entity_id_by_name = {}
         self.state_cache = {}
 
-        for sensor_name, sensor_mac in settings.bthome_sensors.items():
-            sensor = crud.get_sensor_by_name(self._db, sensor_name)
-            if sensor is None:
-                sensor = crud.create_sensor(
-                    self._db, schemas.SensorCreate(name=sensor_name, address=sensor_mac)
+        sensors = crud.provision_sensors(
+            self._db,
+            {
+                sensor_name: (
+                    schemas.SensorCreate(name=sensor_name, address=sensor_mac),
+                    settings.bthome_entities[sensor_name],
                 )
-
-            entities = crud.get_entities_by_sensor(self._db, sensor.id)
-            self.entity_id_by_name[sensor_mac] = {e.name: e.id for e in entities}
-
-            for entity_name in settings.bthome_entities[sensor_name]:
-                if entity_name not in self.entity_id_by_name[sensor_mac].keys():
-                    entity = crud.create_entity(
-                        self._db, schemas.EntityCreate(name=entity_name), sensor.id
-                    )
-                    self.entity_id_by_name[sensor_mac][entity_name] = entity.id
+                for sensor_name, sensor_mac in settings.bthome_sensors.items()
+            },
+        )
+        for sensor_name, sensor_mac in settings.bthome_sensors.items():
+            self.entity_id_by_name[sensor_mac] = sensors[sensor_name].entities
 
         self.scanner = BTHomeBaseScanner(
             self.entity_id_by_name.keys(), callback=self._bthome_callback
@@ -46,9 +43,13 @@ class BTHomeScanner:
                     entity_id = self.entity_id_by_name[sensor_mac][entity_name]
                     self.state_cache[entity_id] = state["value"]
 
-    async def process_runner(self):
-        while 1:
-            for entity_id, state in self.state_cache.items():
-                await crud.create_state(self._db, entity_id, str(state))
-
-            await asyncio.sleep(settings.state_monitor_sample_interval)
+    async def sample(self):
+        """Store the cached value of every entity that is due for a sample."""
+        now = time.monotonic()
+        states = {}
+        for entity_id, state in self.state_cache.items():
+            if entity_sampler.due(entity_id, now):
+                states[entity_id] = str(state)
+                entity_sampler.mark(entity_id, now)
+        if states:
+            await crud.create_states(self._db, states)
@@ -1,8 +1,9 @@
 import asyncio
+import itertools
 import logging
 import struct
-import threading
-from dataclasses import dataclass
+from collections import deque
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 
 import serial
@@ -10,6 +11,9 @@ import serial
 from ..config import settings
 from ..database import get_db
 from .. import crud, schemas
+from ..metrics import REGISTRY
+from ..single_flight import AsyncSingleFlight
+from .serial_transport import SerialTransport
 
 logger = logging.getLogger("uvicorn.camper-api.hymer_serial")
 
@@ -60,19 +64,51 @@ ERROR_BITS = {
     0x0400: "BROWN_OUT",
 }
 
+NACK_BUSY = 0x05
+
+# Requests without side effects; identical ones in flight are coalesced.
+READ_OPCODES = {
+    OP_GET_HOUSEHOLD,
+    OP_GET_PUMP,
+    OP_GET_VOLTAGE,
+    OP_GET_WATER,
+    OP_GET_WASTE,
+    OP_GET_ALL,
+    OP_PING,
+    OP_VERSION,
+    OP_GET_ERRORS,
+}
+
+# Lower value is sent first.
+PRIORITY_ACTION = 0
+PRIORITY_KEEPALIVE = 1
+PRIORITY_BACKGROUND = 2
+
 NEOPIXEL_BLACK = 15
 
 
-def crc16_mcrf4xx(data: bytes) -> int:
-    crc = 0xFFFF
-    for b in data:
-        crc ^= b
+def _crc16_table() -> list[int]:
+    table = []
+    for i in range(256):
+        crc = i
         for _ in range(8):
             if crc & 1:
                 crc = (crc >> 1) ^ 0x8408
             else:
                 crc >>= 1
-    return crc & 0xFFFF
+        table.append(crc)
+    return table
+
+
+CRC16_TABLE = _crc16_table()
+
+
+def crc16_mcrf4xx(data: bytes, crc: int = 0xFFFF) -> int:
+    """CRC-16/MCRF4XX; pass a previous result as `crc` to continue it."""
+    table = CRC16_TABLE
+    for b in data:
+        crc = (crc >> 8) ^ table[(crc ^ b) & 0xFF]
+    return crc
 
 
 def build_frame(opcode: int, payload: bytes = b"") -> bytes:
@@ -87,12 +123,64 @@ def decode_errors_list(mask: int) -> list[str]:
     return [name for bit, name in ERROR_BITS.items() if mask & bit]
 
 
+TELEMETRY_ENTITIES = (
+    "household_voltage",
+    "mains_voltage",
+    "starter_voltage",
+    "water_state",
+    "waste_state",
+    "household_state",
+    "pump_state",
+    "errors",
+)
+
+
+def unpack_telemetry(payload: bytes) -> tuple[int, ...]:
+    """Unpack an 11 byte telemetry block into raw values per TELEMETRY_ENTITIES."""
+    vh, vm, vs, water, waste, flags, errs = struct.unpack("<HHHBBBH", payload)
+    return vh, vm, vs, water, waste, (flags >> 0) & 1, (flags >> 2) & 1, errs
+
+
+def format_telemetry_value(index: int, value: int) -> str:
+    if index < 3:
+        # Firmware reports voltages in mV; convert to V for storage so the
+        # database units match what the old ASCII protocol delivered.
+        return f"{value / 1000:.3f}"
+    if index == 7:
+        return f"0x{value:04X}"
+    return str(value)
+
+
+def decode_telemetry(payload: bytes) -> dict[str, str]:
+    """Decode an 11 byte telemetry block into entity name -> state string."""
+    return {
+        name: format_telemetry_value(i, value)
+        for i, (name, value) in enumerate(
+            zip(TELEMETRY_ENTITIES, unpack_telemetry(payload))
+        )
+    }
+
+
 @dataclass
 class Frame:
     opcode: int
     payload: bytes
 
 
+@dataclass(order=True)
+class Request:
+    priority: int
+    seq: int
+    opcode: int = field(compare=False)
+    payload: bytes = field(compare=False)
+    timeout: float = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    attempts: int = field(default=0, compare=False)
+    queued_at: float = field(default=0.0, compare=False)
+    sent_at: float = field(default=0.0, compare=False)
+    timer: asyncio.TimerHandle | None = field(default=None, compare=False)
+
+
 class NackError(Exception):
     def __init__(self, opcode: int, reason: int):
         self.opcode = opcode
@@ -102,101 +190,138 @@ class NackError(Exception):
 
 
 class FrameParser:
-    """Stateful byte-by-byte parser; mirrors the firmware state machine."""
+    """
+    Buffered frame parser with the same results as the firmware state machine.
 
-    IDLE, GOT_SOF, GOT_OP, IN_PAYLOAD, GOT_CRC_LO, GOT_CRC_HI = range(6)
+    Bytes are collected in a buffer; `find` resyncs on SOF and whole frames
+    are sliced out once complete. A bad length drops only the header, a bad
+    CRC drops the whole frame; both are counted.
+    """
+
+    SOF_BYTE = bytes([SOF])
 
     def __init__(self) -> None:
-        self.state = self.IDLE
-        self.opcode = 0
-        self.length = 0
-        self.payload = bytearray()
-        self.crc_lo = 0
+        self.buffer = bytearray()
+        self.crc_errors = 0
+        self.length_errors = 0
 
     def feed_stream(self, data: bytes) -> list[Frame]:
         out: list[Frame] = []
-        for b in data:
-            if self.state == self.IDLE:
-                if b == SOF:
-                    self.state = self.GOT_SOF
-                    self.payload.clear()
-                continue
-            if self.state == self.GOT_SOF:
-                self.opcode = b
-                self.state = self.GOT_OP
+        buf = self.buffer
+        buf += data
+        n = len(buf)
+        pos = 0
+        while True:
+            start = buf.find(self.SOF_BYTE, pos)
+            if start < 0:
+                pos = n
+                break
+            if start + 3 > n:
+                pos = start
+                break
+            length = buf[start + 2]
+            if length > MAX_PAYLOAD:
+                self.length_errors += 1
+                pos = start + 3
                 continue
-            if self.state == self.GOT_OP:
-                if b > MAX_PAYLOAD:
-                    self.state = self.IDLE
-                    continue
-                self.length = b
-                self.state = self.IN_PAYLOAD if b else self.GOT_CRC_LO
-                continue
-            if self.state == self.IN_PAYLOAD:
-                self.payload.append(b)
-                if len(self.payload) >= self.length:
-                    self.state = self.GOT_CRC_LO
-                continue
-            if self.state == self.GOT_CRC_LO:
-                self.crc_lo = b
-                self.state = self.GOT_CRC_HI
-                continue
-            if self.state == self.GOT_CRC_HI:
-                received = self.crc_lo | (b << 8)
-                body = bytes([self.opcode, self.length]) + bytes(self.payload)
-                if received == crc16_mcrf4xx(body):
-                    out.append(Frame(self.opcode, bytes(self.payload)))
-                self.state = self.IDLE
+            end = start + 5 + length
+            if end > n:
+                pos = start
+                break
+            received = buf[end - 2] | (buf[end - 1] << 8)
+            if received == crc16_mcrf4xx(buf[start + 1 : end - 2]):
+                out.append(Frame(buf[start + 1], bytes(buf[start + 3 : end - 2])))
+            else:
+                self.crc_errors += 1
+            pos = end
+        del buf[:pos]
         return out
 
 
-class HymerSerial:
+class HymerSerial(asyncio.Protocol):
     def __init__(self):
-        self._serial = serial.Serial(
-            settings.hymer_serial_port,
-            settings.hymer_serial_speed,
-            timeout=settings.hymer_serial_timeout,
-        )
+        self._serial = self._open_serial()
 
         self._db = next(get_db())
 
-        self.sensor = crud.get_sensor_by_name(self._db, settings.hymer_sensor)
-        if self.sensor is None:
-            self.sensor = crud.create_sensor(
-                self._db, schemas.SensorCreate(name=settings.hymer_sensor)
-            )
-
-        entities = crud.get_entities_by_sensor(self._db, self.sensor.id)
-        self.entities_by_name = {e.name: e for e in entities}
-
-        for entity_name in settings.hymer_entities:
-            if entity_name not in self.entities_by_name.keys():
-                entity = crud.create_entity(
-                    self._db, schemas.EntityCreate(name=entity_name), self.sensor.id
+        self.sensor = crud.provision_sensors(
+            self._db,
+            {
+                settings.hymer_sensor: (
+                    schemas.SensorCreate(name=settings.hymer_sensor),
+                    settings.hymer_entities,
                 )
-                self.entities_by_name[entity_name] = entity
+            },
+        )[settings.hymer_sensor]
+        self.entity_ids = self.sensor.entities
 
         self.subscribe_until: datetime = datetime.min
-        self._pending: dict[int, asyncio.Future] = {}
+        self._telemetry_entity_ids = [
+            self.entity_ids[name] for name in TELEMETRY_ENTITIES
+        ]
+        self._last_record: tuple[int, ...] | None = None
+        self._last_states: dict[int, str] = {}
+        self.frames_received = 0
+        self.frames_deduped = 0
+        self.states_stored = 0
+        # The wire protocol carries no sequence number; replies are matched to
+        # the oldest in-flight request with the same opcode. A request that
+        # timed out leaves a tombstone, valid for another timeout, so its late
+        # reply is dropped instead of resolving the next request.
+        self._in_flight: dict[int, deque[Request]] = {}
+        self._tombstones: dict[int, deque[float]] = {}
+        self._late_dropped_at: dict[int, float] = {}
+        self.late_replies = 0
+        self._seq = itertools.count()
+        self.single_flight = AsyncSingleFlight()
+        self.queue_wait = REGISTRY.histogram(
+            "camper_hymer_queue_wait_seconds",
+            "Time camper board requests wait for a pipeline slot",
+        )
+        self.round_trip = REGISTRY.histogram(
+            "camper_hymer_round_trip_seconds",
+            "Camper board request to reply round trip time",
+        )
+        self.busy_retries = 0
+        self.timeouts = 0
+        self.frames_total = 0
+        self.frames_per_s = 0.0
+        self.nacks: dict[str, int] = {}
+        self.reconnects = 0
+        self._last_frame_at = 0.0
+        self._ping_failures = 0
+        self._crc_window_start = 0.0
+        self._crc_window_errors = 0
         self._parser = FrameParser()
-        self._stop_evt = threading.Event()
+        self._stopping = False
         self._loop: asyncio.AbstractEventLoop | None = None
-        self._tx_lock: asyncio.Lock | None = None
-        self._reader_thread: threading.Thread | None = None
+        self._queue: asyncio.PriorityQueue | None = None
+        self._window: asyncio.Semaphore | None = None
+        self._dispatch_handle: asyncio.Task | None = None
+        self._transport: SerialTransport | None = None
+        self._can_write: asyncio.Event | None = None
+        self._connection_lost: asyncio.Event | None = None
+        self._telemetry_queue: asyncio.Queue | None = None
+        self._telemetry_handle: asyncio.Task | None = None
         self._keepalive_handle: asyncio.Task | None = None
+        self._watchdog_handle: asyncio.Task | None = None
+        self._reconnect_handle: asyncio.Task | None = None
 
     async def start(self) -> None:
         self._loop = asyncio.get_running_loop()
-        self._tx_lock = asyncio.Lock()
-        # Short read timeout so the reader thread checks _stop_evt promptly.
-        self._serial.timeout = 1.0
+        self._queue = asyncio.PriorityQueue()
+        self._window = asyncio.Semaphore(settings.hymer_pipeline_window)
+        self._can_write = asyncio.Event()
+        self._can_write.set()
+        self._connection_lost = asyncio.Event()
+        self._telemetry_queue = asyncio.Queue(maxsize=16)
 
-        self._reader_thread = threading.Thread(
-            target=self._reader_loop, name="hymer-serial-reader", daemon=True
-        )
-        self._reader_thread.start()
+        self._connect(self._serial)
 
+        self._dispatch_handle = asyncio.create_task(self._dispatch_task())
+        self._telemetry_handle = asyncio.create_task(self._telemetry_task())
         self._keepalive_handle = asyncio.create_task(self._keepalive_task())
+        self._watchdog_handle = asyncio.create_task(self._watchdog_task())
 
         # Turn off both neopixels at startup (best-effort).
         for led in (1, 2):
@@ -208,31 +333,51 @@ class HymerSerial:
                 logger.warning(f"neopixel{led} off failed: {ex!r}")
 
     async def stop(self) -> None:
-        self._stop_evt.set()
+        self._stopping = True
 
         try:
             await self._request(OP_UNSUBSCRIBE, b"")
         except Exception:
             pass
 
-        if self._keepalive_handle is not None:
-            self._keepalive_handle.cancel()
+        for handle in (
+            self._reconnect_handle,
+            self._watchdog_handle,
+            self._keepalive_handle,
+            self._telemetry_handle,
+            self._dispatch_handle,
+        ):
+            if handle is None:
+                continue
+            handle.cancel()
             try:
-                await self._keepalive_handle
+                await handle
             except (asyncio.CancelledError, Exception):
                 pass
 
-        try:
-            self._serial.close()
-        except Exception:
-            pass
-
-        if self._reader_thread is not None:
-            self._reader_thread.join(timeout=2.0)
+        if self._transport is not None and not self._transport.is_closing():
+            # Flushes pending writes before closing the port.
+            self._transport.close()
+            try:
+                await asyncio.wait_for(self._connection_lost.wait(), 2.0)
+            except asyncio.TimeoutError:
+                self._transport.abort()
 
     def bump_subscription(self, ttl_seconds: int = 30) -> None:
         self.subscribe_until = datetime.now() + timedelta(seconds=ttl_seconds)
 
+    async def get_all(self) -> dict:
+        """Poll all telemetry values; concurrent callers share one round trip."""
+        return await self.single_flight.do(OP_GET_ALL, self._get_all)
+
+    async def _get_all(self) -> dict:
+        frame = await self._request(OP_GET_ALL, priority=PRIORITY_BACKGROUND)
+        telemetry = frame.payload[1:]
+        if len(telemetry) != 11:
+            raise RuntimeError(f"bad GET_ALL length {len(telemetry)}")
+        await self._handle_telemetry(telemetry)
+        return decode_telemetry(telemetry)
+
     async def household(self, state) -> dict:
         s = int(state)
         frame = await self._request(OP_SET_HOUSEHOLD, bytes([s]))
@@ -262,35 +407,187 @@ class HymerSerial:
         await self._store_state("errors", remaining_str)
         return {"state": remaining_str, "bits": decode_errors_list(remaining)}
 
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "in_flight": sum(len(q) for q in self._in_flight.values()),
+            "frames_received": self.frames_received,
+            "frames_deduped": self.frames_deduped,
+            "states_stored": self.states_stored,
+            "busy_retries": self.busy_retries,
+            "timeouts": self.timeouts,
+            "late_replies": self.late_replies,
+            "queue_wait": self.queue_wait.snapshot(),
+            "round_trip": self.round_trip.snapshot(),
+            "link": self.link_stats(),
+        }
+
+    def link_stats(self) -> dict:
+        return {
+            "connected": self._transport is not None
+            and not self._transport.is_closing(),
+            "frames_per_s": self.frames_per_s,
+            "frames_total": self.frames_total,
+            "crc_errors": self._parser.crc_errors,
+            "length_errors": self._parser.length_errors,
+            "nacks": dict(self.nacks),
+            "reconnects": self.reconnects,
+        }
+
+    # ---- asyncio.Protocol ----
+
+    def data_received(self, data: bytes) -> None:
+        crc_errors = self._parser.crc_errors
+        try:
+            frames = self._parser.feed_stream(data)
+        except Exception as ex:
+            logger.error(f"parser error: {ex}")
+            return
+        if frames:
+            self.frames_total += len(frames)
+            self._last_frame_at = self._loop.time()
+        for frame in frames:
+            self._on_frame(frame)
+        if self._parser.crc_errors != crc_errors:
+            self._check_crc_storm(self._parser.crc_errors - crc_errors)
+
+    def pause_writing(self) -> None:
+        self._can_write.clear()
+
+    def resume_writing(self) -> None:
+        self._can_write.set()
+
+    def connection_lost(self, exc: Exception | None) -> None:
+        self._can_write.set()
+        self._connection_lost.set()
+        # Replies sent over the old link will never arrive.
+        self._tombstones.clear()
+        for requests in self._in_flight.values():
+            while requests:
+                request = requests.popleft()
+                self._release(request)
+                if not request.future.done():
+                    request.future.set_exception(
+                        ConnectionError("serial connection lost")
+                    )
+
+        if not self._stopping and (
+            self._reconnect_handle is None or self._reconnect_handle.done()
+        ):
+            logger.error(f"serial connection lost: {exc!r}; reconnecting")
+            self._start_reconnect()
+
     # ---- internals ----
 
-    def _reader_loop(self) -> None:
-        while not self._stop_evt.is_set():
+    def _open_serial(self) -> serial.Serial:
+        return serial.Serial(settings.hymer_serial_port, settings.hymer_serial_speed)
+
+    def _connect(self, serial_instance: serial.Serial) -> None:
+        self._serial = serial_instance
+        self._parser.buffer.clear()
+        self._connection_lost.clear()
+        self._ping_failures = 0
+        self._last_frame_at = self._loop.time()
+        self._transport = SerialTransport(self._loop, self, serial_instance)
+
+    async def _reconnect(self) -> None:
+        """Reopen the port with exponential backoff and restore the subscription."""
+        delay = settings.hymer_reconnect_min_delay
+        while not self._stopping:
+            await asyncio.sleep(delay)
             try:
-                data = self._serial.read(64)
-            except Exception as ex:
-                if self._stop_evt.is_set():
-                    return
-                logger.error(f"serial read error: {ex}")
+                serial_instance = self._open_serial()
+                try:
+                    self._connect(serial_instance)
+                except Exception:
+                    serial_instance.close()
+                    raise
+            except (serial.SerialException, OSError) as ex:
+                logger.warning(f"serial reopen failed: {ex!r}; retry in {delay}s")
+                delay = min(delay * 2, settings.hymer_reconnect_max_delay)
                 continue
-            if not data:
+            except Exception:
+                logger.exception(f"serial reopen failed; retry in {delay}s")
+                delay = min(delay * 2, settings.hymer_reconnect_max_delay)
                 continue
-            try:
-                frames = self._parser.feed_stream(data)
-            except Exception as ex:
-                logger.error(f"parser error: {ex}")
+
+            self.reconnects += 1
+            logger.warning("serial link re-established")
+
+            if datetime.now() < self.subscribe_until:
+                try:
+                    await self._request(
+                        OP_SUBSCRIBE, bytes([0]), priority=PRIORITY_KEEPALIVE
+                    )
+                except (asyncio.TimeoutError, NackError, ConnectionError) as ex:
+                    logger.warning(f"re-subscribe failed: {ex!r}")
+
+            # The link may have dropped again while re-subscribing.
+            if not self._connection_lost.is_set():
+                return
+            delay = settings.hymer_reconnect_min_delay
+
+    def _start_reconnect(self) -> None:
+        self._reconnect_handle = asyncio.create_task(self._reconnect())
+        self._reconnect_handle.add_done_callback(self._reconnect_done)
+
+    def _reconnect_done(self, task: asyncio.Task) -> None:
+        if task.cancelled() or task.exception() is None:
+            return
+        logger.error("serial reconnect task died", exc_info=task.exception())
+        if not self._stopping and self._connection_lost.is_set():
+            self._start_reconnect()
+
+    def _link_down(self, reason: str) -> None:
+        """Drop a dead link; connection_lost then starts the reconnect."""
+        if self._transport is not None and not self._transport.is_closing():
+            logger.error(f"serial link down: {reason}")
+            self._transport.abort()
+
+    def _check_crc_storm(self, errors: int) -> None:
+        now = self._loop.time()
+        if now - self._crc_window_start > settings.hymer_crc_storm_window:
+            self._crc_window_start = now
+            self._crc_window_errors = 0
+        self._crc_window_errors += errors
+        if self._crc_window_errors >= settings.hymer_crc_storm_threshold:
+            self._crc_window_errors = 0
+            self._link_down(f"CRC storm ({settings.hymer_crc_storm_threshold} errors)")
+
+    async def _watchdog_task(self) -> None:
+        """Track the frame rate and ping the board when the link goes quiet."""
+        interval = settings.hymer_ping_interval
+        mark_time, mark_frames = self._loop.time(), self.frames_total
+        while not self._stopping:
+            await asyncio.sleep(interval)
+
+            now = self._loop.time()
+            self.frames_per_s = (self.frames_total - mark_frames) / (now - mark_time)
+            mark_time, mark_frames = now, self.frames_total
+
+            if self._transport is None or self._transport.is_closing():
+                continue
+            if now - self._last_frame_at < interval:
+                self._ping_failures = 0
                 continue
-            for frame in frames:
-                # Bridge into the event loop. Bind frame in default arg to dodge
-                # the late-binding closure trap in this for-loop.
-                self._loop.call_soon_threadsafe(
-                    lambda fr=frame: asyncio.create_task(self._on_frame(fr))
-                )
 
-    async def _on_frame(self, frame: Frame) -> None:
+            try:
+                await self._request(OP_PING, b"", priority=PRIORITY_KEEPALIVE)
+                self._ping_failures = 0
+            except NackError:
+                self._ping_failures = 0
+            except (asyncio.TimeoutError, ConnectionError):
+                self._ping_failures += 1
+                if self._ping_failures >= settings.hymer_ping_failures:
+                    self._link_down(f"{self._ping_failures} ping timeouts")
+
+    def _on_frame(self, frame: Frame) -> None:
         op = frame.opcode
         if op == OP_TELEMETRY_PUSH:
-            await self._handle_telemetry(frame.payload)
+            try:
+                self._telemetry_queue.put_nowait(frame.payload)
+            except asyncio.QueueFull:
+                logger.warning("telemetry queue full, dropping frame")
             return
         if op == OP_EVENT:
             self._handle_event(frame.payload)
@@ -300,11 +597,13 @@ class HymerSerial:
                 logger.warning("ACK with empty payload")
                 return
             acked = frame.payload[0]
-            fut = self._pending.pop(acked, None)
-            if fut is not None and not fut.done():
-                fut.set_result(frame)
-            else:
+            if self._is_late_reply(acked):
+                return
+            request = self._pop_in_flight(acked)
+            if request is None:
                 logger.info(f"unmatched ACK op=0x{acked:02X}")
+            elif not request.future.done():
+                request.future.set_result(frame)
             return
         if op == OP_NACK:
             if len(frame.payload) < 2:
@@ -312,19 +611,32 @@ class HymerSerial:
                 return
             acked = frame.payload[0]
             reason = frame.payload[1]
+            reason_name = NACK_REASONS.get(reason, f"0x{reason:02X}")
+            self.nacks[reason_name] = self.nacks.get(reason_name, 0) + 1
             if acked == 0xFF:
                 logger.warning(
                     f"unsolicited NACK reason={NACK_REASONS.get(reason, hex(reason))}"
                 )
                 return
-            fut = self._pending.pop(acked, None)
-            if fut is not None and not fut.done():
-                fut.set_exception(NackError(acked, reason))
-            else:
+            if self._is_late_reply(acked):
+                return
+            request = self._pop_in_flight(acked)
+            if request is None:
                 logger.info(
                     f"unmatched NACK op=0x{acked:02X} "
                     f"reason={NACK_REASONS.get(reason, hex(reason))}"
                 )
+            elif (
+                reason == NACK_BUSY
+                and request.attempts <= settings.hymer_busy_retries
+                and not request.future.done()
+            ):
+                self.busy_retries += 1
+                self._loop.call_later(
+                    0.05 * request.attempts, self._queue.put_nowait, request
+                )
+            elif not request.future.done():
+                request.future.set_exception(NackError(acked, reason))
             return
         logger.info(f"unhandled frame op=0x{op:02X} payload={frame.payload.hex()}")
 
@@ -332,19 +644,29 @@ class HymerSerial:
         if len(payload) != 11:
             logger.warning(f"bad telemetry length {len(payload)}")
             return
-        vh, vm, vs, water, waste, flags, errs = struct.unpack("<HHHBBBH", payload)
-        household_on = (flags >> 0) & 1
-        pump_on = (flags >> 2) & 1
-        # Firmware reports voltages in mV; convert to V for storage so the
-        # database units match what the old ASCII protocol delivered.
-        await self._store_state("household_voltage", f"{vh / 1000:.3f}")
-        await self._store_state("mains_voltage", f"{vm / 1000:.3f}")
-        await self._store_state("starter_voltage", f"{vs / 1000:.3f}")
-        await self._store_state("water_state", str(water))
-        await self._store_state("waste_state", str(waste))
-        await self._store_state("household_state", str(household_on))
-        await self._store_state("pump_state", str(pump_on))
-        await self._store_state("errors", f"0x{errs:04X}")
+        self.frames_received += 1
+        record = unpack_telemetry(payload)
+        previous = self._last_record
+
+        if record == previous:
+            self.frames_deduped += 1
+            states = self._last_states
+        else:
+            # Only format values that changed since the previous frame.
+            states = {}
+            for i, (entity_id, value) in enumerate(
+                zip(self._telemetry_entity_ids, record)
+            ):
+                if previous is not None and previous[i] == value:
+                    states[entity_id] = self._last_states[entity_id]
+                else:
+                    states[entity_id] = format_telemetry_value(i, value)
+            self._last_record = record
+            self._last_states = states
+
+        # Unchanged values only refresh their cache timestamp unless their
+        # storage interval has passed.
+        self.states_stored += await crud.create_states(self._db, states)
 
     def _handle_event(self, payload: bytes) -> None:
         if len(payload) >= 3 and payload[0] == 0x01:
@@ -356,48 +678,158 @@ class HymerSerial:
         logger.info(f"event kind={kind} body={payload[1:].hex()}")
 
     async def _request(
-        self, opcode: int, payload: bytes = b"", timeout: float | None = None
+        self,
+        opcode: int,
+        payload: bytes = b"",
+        timeout: float | None = None,
+        priority: int = PRIORITY_ACTION,
     ) -> Frame:
-        if self._tx_lock is None or self._loop is None:
+        if self._queue is None or self._loop is None:
             raise RuntimeError("HymerSerial.start() has not been called")
         if timeout is None:
             timeout = settings.hymer_request_timeout
 
-        async with self._tx_lock:
-            if opcode in self._pending:
-                raise RuntimeError(
-                    f"request for opcode 0x{opcode:02X} already in flight"
-                )
-            fut: asyncio.Future = self._loop.create_future()
-            self._pending[opcode] = fut
+        if opcode in READ_OPCODES:
+            return await self.single_flight.do(
+                (opcode, payload), self._submit, opcode, payload, timeout, priority
+            )
+        return await self._submit(opcode, payload, timeout, priority)
 
-            try:
-                self._serial.write(build_frame(opcode, payload))
-                self._serial.flush()
-            except Exception:
-                self._pending.pop(opcode, None)
-                raise
+    async def _submit(
+        self, opcode: int, payload: bytes, timeout: float, priority: int
+    ) -> Frame:
+        if self._transport is None or self._transport.is_closing():
+            raise ConnectionError("serial connection closed")
+
+        request = Request(
+            priority,
+            next(self._seq),
+            opcode,
+            payload,
+            timeout,
+            self._loop.create_future(),
+            queued_at=self._loop.time(),
+        )
+        self._queue.put_nowait(request)
 
+        # Guard against requests that never leave the queue; the per attempt
+        # round-trip timeout is enforced by the dispatcher.
+        deadline = timeout * (settings.hymer_busy_retries + 2)
         try:
-            return await asyncio.wait_for(fut, timeout)
+            return await asyncio.wait_for(request.future, deadline)
         except asyncio.TimeoutError:
-            self._pending.pop(opcode, None)
+            # Round-trip timeouts are counted in _expire; the guard cancels.
+            if request.future.cancelled():
+                self.timeouts += 1
             raise
 
+    async def _dispatch_task(self) -> None:
+        """Send queued requests by priority, up to the pipeline window."""
+        while True:
+            await self._window.acquire()
+            request = await self._queue.get()
+            if request.future.done():
+                self._window.release()
+                continue
+            if self._transport is None or self._transport.is_closing():
+                self._window.release()
+                request.future.set_exception(
+                    ConnectionError("serial connection closed")
+                )
+                continue
+
+            now = self._loop.time()
+            if request.attempts == 0:
+                self.queue_wait.observe(now - request.queued_at)
+            request.attempts += 1
+            request.sent_at = now
+            request.timer = self._loop.call_later(
+                request.timeout, self._expire, request
+            )
+            self._in_flight.setdefault(request.opcode, deque()).append(request)
+
+            self._transport.write(build_frame(request.opcode, request.payload))
+            # Back-pressure: wait while the transport write buffer is full.
+            await self._can_write.wait()
+
+    def _is_late_reply(self, opcode: int) -> bool:
+        """Consume the oldest live tombstone of `opcode`, if any."""
+        tombstones = self._tombstones.get(opcode)
+        now = self._loop.time()
+        while tombstones and tombstones[0] < now:
+            tombstones.popleft()
+        if not tombstones:
+            return False
+        tombstones.popleft()
+        self._late_dropped_at[opcode] = now
+        self.late_replies += 1
+        logger.info(f"late reply for op=0x{opcode:02X} dropped")
+        return True
+
+    def _pop_in_flight(self, opcode: int) -> Request | None:
+        requests = self._in_flight.get(opcode)
+        if not requests:
+            return None
+        request = requests.popleft()
+        self._release(request)
+        self.round_trip.observe(self._loop.time() - request.sent_at)
+        return request
+
+    def _release(self, request: Request) -> None:
+        if request.timer is not None:
+            request.timer.cancel()
+            request.timer = None
+        self._window.release()
+
+    def _expire(self, request: Request) -> None:
+        requests = self._in_flight.get(request.opcode)
+        if not requests or request not in requests:
+            return
+        requests.remove(request)
+        request.timer = None
+        self._window.release()
+        self.timeouts += 1
+        # When a reply was dropped as late while this request was in flight,
+        # that reply was probably this request's own (the earlier one was
+        # lost); no tombstone then, so one lost reply shifts nothing further.
+        if self._late_dropped_at.get(request.opcode, -1.0) < request.sent_at:
+            self._tombstones.setdefault(request.opcode, deque()).append(
+                self._loop.time() + request.timeout
+            )
+        if not request.future.done():
+            request.future.set_exception(
+                asyncio.TimeoutError(f"no reply for op=0x{request.opcode:02X}")
+            )
+
+    async def _telemetry_task(self) -> None:
+        while True:
+            payload = await self._telemetry_queue.get()
+            try:
+                await self._handle_telemetry(payload)
+            except Exception:
+                logger.error("telemetry store failed", exc_info=True)
+
     async def _keepalive_task(self) -> None:
-        while not self._stop_evt.is_set():
+        while not self._stopping:
             try:
                 await asyncio.sleep(3)
             except asyncio.CancelledError:
                 return
             if datetime.now() < self.subscribe_until:
                 try:
-                    await self._request(OP_SUBSCRIBE, bytes([0]))
-                except (asyncio.TimeoutError, NackError, RuntimeError) as ex:
+                    await self._request(
+                        OP_SUBSCRIBE, bytes([0]), priority=PRIORITY_KEEPALIVE
+                    )
+                except (
+                    asyncio.TimeoutError,
+                    NackError,
+                    RuntimeError,
+                    ConnectionError,
+                ) as ex:
                     logger.warning(f"subscribe keepalive failed: {ex!r}")
 
     async def _store_state(self, entity_name, state):
-        await crud.create_state(self._db, self.entities_by_name[entity_name].id, state)
+        await crud.create_state(self._db, self.entity_ids[entity_name], state)
 
 
 def _self_check_crc() -> None:
@@ -0,0 +1,274 @@
+import argparse
+import asyncio
+import os
+import random
+import struct
+import tty
+from datetime import datetime, timedelta
+
+from .hymer_serial import (
+    FrameParser,
+    build_frame,
+    OP_GET_HOUSEHOLD,
+    OP_GET_PUMP,
+    OP_GET_VOLTAGE,
+    OP_GET_WATER,
+    OP_GET_WASTE,
+    OP_GET_ALL,
+    OP_SET_HOUSEHOLD,
+    OP_SET_PUMP,
+    OP_SET_NEOPIXEL,
+    OP_SUBSCRIBE,
+    OP_UNSUBSCRIBE,
+    OP_PING,
+    OP_VERSION,
+    OP_GET_ERRORS,
+    OP_CLEAR_ERRORS,
+    OP_TELEMETRY_PUSH,
+    OP_EVENT,
+    OP_ACK,
+    OP_NACK,
+)
+
+NACK_BAD_LEN = 0x02
+NACK_UNKNOWN_OPCODE = 0x03
+NACK_BAD_PARAM = 0x04
+NACK_BUSY = 0x05
+
+EVENT_ERROR_RAISED = 0x01
+
+
+class HymerSimulator:
+    """
+    Simulated PIC firmware on a pseudo-terminal.
+
+    Implements the binary protocol of hymer_serial: ACK/NACK replies, idle
+    and subscribed telemetry pushes and error events. Replies can be delayed,
+    dropped, corrupted or answered with BUSY to exercise the API side. Point
+    `hymer_serial_port` at `port` (or `link`) to run the API against it.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.005,
+        drop_rate: float = 0.0,
+        corrupt_rate: float = 0.0,
+        busy_rate: float = 0.0,
+        idle_interval: float = 60.0,
+        push_interval: float = 1.0,
+        subscribe_ttl: float = 30.0,
+        link: str | None = None,
+        seed: int | None = None,
+    ):
+        self.latency = latency
+        self.drop_rate = drop_rate
+        self.corrupt_rate = corrupt_rate
+        self.busy_rate = busy_rate
+        self.idle_interval = idle_interval
+        self.push_interval = push_interval
+        self.subscribe_ttl = subscribe_ttl
+        self.link = link
+        self._random = random.Random(seed)
+
+        self.household = 0
+        self.pump = 0
+        self.household_mv = 12800
+        self.mains_mv = 0
+        self.starter_mv = 12600
+        self.water = 80
+        self.waste = 10
+        self.errors = 0x0400  # BROWN_OUT after power up
+        self.subscribed_until = datetime.min
+
+        self.frames_received = 0
+        self.frames_sent = 0
+        self.telemetry_sent = 0
+
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._slave)
+        self.port = os.ttyname(self._slave)
+        self._parser = FrameParser()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._push_handle: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        if self.link:
+            if os.path.islink(self.link):
+                os.unlink(self.link)
+            os.symlink(self.port, self.link)
+        self._loop.add_reader(self._master, self._read_ready)
+        self._push_handle = asyncio.create_task(self._push_task())
+
+    async def stop(self) -> None:
+        self._loop.remove_reader(self._master)
+        if self._push_handle is not None:
+            self._push_handle.cancel()
+            try:
+                await self._push_handle
+            except asyncio.CancelledError:
+                pass
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+        os.close(self._master)
+        os.close(self._slave)
+
+    def set_push_interval(self, push_interval: float) -> None:
+        self.push_interval = push_interval
+        self._wakeup.set()
+
+    def raise_error(self, mask: int) -> None:
+        self.errors |= mask
+        self._send(OP_EVENT, struct.pack("<BH", EVENT_ERROR_RAISED, mask))
+
+    def telemetry(self) -> bytes:
+        flags = self.household | (self.pump << 2)
+        return struct.pack(
+            "<HHHBBBH",
+            self.household_mv,
+            self.mains_mv,
+            self.starter_mv,
+            self.water,
+            self.waste,
+            flags,
+            self.errors,
+        )
+
+    # ---- internals ----
+
+    def _read_ready(self) -> None:
+        try:
+            data = os.read(self._master, 1024)
+        except OSError:
+            return
+        for frame in self._parser.feed_stream(data):
+            self.frames_received += 1
+            self._loop.call_later(
+                self.latency, self._reply, frame.opcode, frame.payload
+            )
+
+    def _send(self, opcode: int, payload: bytes = b"") -> None:
+        frame = bytearray(build_frame(opcode, payload))
+        if self._random.random() < self.corrupt_rate:
+            bit = 1 << self._random.randrange(8)
+            frame[self._random.randrange(1, len(frame))] ^= bit
+        os.write(self._master, frame)
+        self.frames_sent += 1
+
+    def _ack(self, opcode: int, payload: bytes = b"") -> None:
+        self._send(OP_ACK, bytes([opcode]) + payload)
+
+    def _nack(self, opcode: int, reason: int) -> None:
+        self._send(OP_NACK, bytes([opcode, reason]))
+
+    def _reply(self, opcode: int, payload: bytes) -> None:
+        if self._random.random() < self.drop_rate:
+            return
+        if self._random.random() < self.busy_rate:
+            self._nack(opcode, NACK_BUSY)
+            return
+
+        if opcode == OP_GET_HOUSEHOLD:
+            self._ack(opcode, bytes([self.household]))
+        elif opcode == OP_GET_PUMP:
+            self._ack(opcode, bytes([self.pump]))
+        elif opcode == OP_GET_VOLTAGE:
+            self._ack(opcode, self.telemetry()[:6])
+        elif opcode == OP_GET_WATER:
+            self._ack(opcode, bytes([self.water]))
+        elif opcode == OP_GET_WASTE:
+            self._ack(opcode, bytes([self.waste]))
+        elif opcode == OP_GET_ALL:
+            self._ack(opcode, self.telemetry())
+        elif opcode in (OP_SET_HOUSEHOLD, OP_SET_PUMP):
+            if len(payload) != 1:
+                self._nack(opcode, NACK_BAD_LEN)
+            elif payload[0] not in (0, 1):
+                self._nack(opcode, NACK_BAD_PARAM)
+            else:
+                if opcode == OP_SET_HOUSEHOLD:
+                    self.household = payload[0]
+                else:
+                    self.pump = payload[0]
+                self._ack(opcode, payload)
+        elif opcode == OP_SET_NEOPIXEL:
+            if len(payload) != 3:
+                self._nack(opcode, NACK_BAD_LEN)
+            else:
+                self._ack(opcode)
+        elif opcode == OP_SUBSCRIBE:
+            self.subscribed_until = datetime.now() + timedelta(
+                seconds=self.subscribe_ttl
+            )
+            self._ack(opcode)
+            self._wakeup.set()
+        elif opcode == OP_UNSUBSCRIBE:
+            self.subscribed_until = datetime.min
+            self._ack(opcode)
+        elif opcode == OP_PING:
+            self._ack(opcode, payload)
+        elif opcode == OP_VERSION:
+            self._ack(opcode, bytes([1, 0]))
+        elif opcode == OP_GET_ERRORS:
+            self._ack(opcode, struct.pack("<H", self.errors))
+        elif opcode == OP_CLEAR_ERRORS:
+            if len(payload) != 2:
+                self._nack(opcode, NACK_BAD_LEN)
+            else:
+                self.errors &= ~struct.unpack("<H", payload)[0] & 0xFFFF
+                self._ack(opcode, struct.pack("<H", self.errors))
+        else:
+            self._nack(opcode, NACK_UNKNOWN_OPCODE)
+
+    async def _push_task(self) -> None:
+        while True:
+            subscribed = datetime.now() < self.subscribed_until
+            interval = self.push_interval if subscribed else self.idle_interval
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), interval)
+                continue
+            except asyncio.TimeoutError:
+                pass
+            self._send(OP_TELEMETRY_PUSH, self.telemetry())
+            self.telemetry_sent += 1
+
+
+async def _run(args) -> None:
+    simulator = HymerSimulator(
+        latency=args.latency,
+        drop_rate=args.drop_rate,
+        corrupt_rate=args.corrupt_rate,
+        busy_rate=args.busy_rate,
+        idle_interval=args.idle_interval,
+        push_interval=args.push_interval,
+        link=args.link,
+        seed=args.seed,
+    )
+    await simulator.start()
+    print(f"Hymer simulator on {simulator.port}")
+    print(f"Run the API with: HYMER_SERIAL_PORT={args.link or simulator.port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await simulator.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated Hymer PIC firmware")
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--corrupt-rate", type=float, default=0.0)
+    parser.add_argument("--busy-rate", type=float, default=0.0)
+    parser.add_argument("--idle-interval", type=float, default=60.0)
+    parser.add_argument("--push-interval", type=float, default=1.0)
+    parser.add_argument(
+        "--link", help="symlink to create for the pty, e.g. /tmp/ttyHymer"
+    )
+    parser.add_argument("--seed", type=int)
+
+    try:
+        asyncio.run(_run(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -1,5 +1,4 @@
 import logging
-import asyncio
 from datetime import datetime
 from aiohttp import ClientSession, ClientTimeout
 from aiohttp import ClientSession, ClientTimeout
@@ -14,9 +13,17 @@ except ImportError:
 from ..config import settings
 from ..database import get_db
 from .. import crud
+from ..metrics import REGISTRY
 
 logger = logging.getLogger("uvicorn.camper-api.questdb_uploader")
 
+_rows_uploaded = REGISTRY.counter(
+    "camper_questdb_rows_uploaded_total", "States uploaded to QuestDB"
+)
+_upload_rate = REGISTRY.gauge(
+    "camper_questdb_upload_rows_per_second", "Upload rate of the last QuestDB upload"
+)
+
 """
 CREATE TABLE states (
     ts TIMESTAMP,
@@ -84,6 +91,7 @@ class QuestDbUploader:
             sender.flush()
         except IngressError as ex:
             raise QuestImportException(f"IngressError: {ex}")
+        _rows_uploaded.inc(len(states))
 
     async def _upload_chunk_rest(self, session, states):
         for state in states:
@@ -104,6 +112,7 @@ class QuestDbUploader:
                     )
                 if resp_json.get("dml") != "OK":
                     raise QuestImportException(f"Failed to upload state: {resp_json}")
+            _rows_uploaded.inc()
 
     async def get_last_upload(self):
         last_upload_str = await crud.get_parameter_value(self._db, "last_upload")
@@ -184,44 +193,32 @@ class QuestDbUploader:
 
         return new_last_upload
 
-    async def process_runner(self):
-        await asyncio.sleep(settings.startup_delay)
+    async def upload(self):
+        """Upload the states stored since the last upload; run by the scheduler."""
+        started = datetime.now()
+        rows_before = _rows_uploaded.value
+        await self._get_active_config()
+        last_upload = await self.get_last_upload()
 
-        while 1:
-            started = datetime.now()
-            try:
-                await self._get_active_config()
-                last_upload = await self.get_last_upload()
+        logger.info(
+            f"last_upload: {last_upload}, upload_started {started}, config: {self._active_config}"
+        )
 
-                logger.info(
-                    f"last_upload: {last_upload}, upload_started {started}, config: {self._active_config}"
+        if PROTOCOL == "ilp":
+            with Sender.from_conf(self._active_config) as session_sender:
+                new_last_upload = self._process_loop_ilp(
+                    session_sender, started, last_upload
                 )
 
-                if PROTOCOL == "ilp":
-                    with Sender.from_conf(self._active_config) as session_sender:
-                        new_last_upload = self._process_loop_ilp(
-                            session_sender, started, last_upload
-                        )
-
-                else:
-                    timeout = ClientTimeout(total=10)
-                    async with ClientSession(timeout=timeout) as session_sender:
-                        new_last_upload = await self._process_loop_rest(
-                            session_sender, started, last_upload
-                        )
-
-                if new_last_upload:
-                    await self.set_last_upload(new_last_upload)
-
-            except QuestImportException:
-                logger.error("QuestImportException", exc_info=True)
+        else:
+            timeout = ClientTimeout(total=10)
+            async with ClientSession(timeout=timeout) as session_sender:
+                new_last_upload = await self._process_loop_rest(
+                    session_sender, started, last_upload
+                )
 
-            except Exception:
-                logger.error("Exception", exc_info=True)
+        if new_last_upload:
+            await self.set_last_upload(new_last_upload)
 
-            wait_time = (
-                settings.questdb_upload_interval
-                - (datetime.now() - started).total_seconds()
-            )
-            if wait_time > 0:
-                await asyncio.sleep(wait_time)
+        elapsed = (datetime.now() - started).total_seconds()
+        _upload_rate.set((_rows_uploaded.value - rows_before) / max(elapsed, 1e-6))
@@ -0,0 +1,104 @@
+import importlib
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+logger = logging.getLogger("uvicorn.camper-api.plugins")
+
+
+@dataclass(frozen=True)
+class PluginSpec:
+    module: str
+    class_name: str
+    requires: tuple[str, ...] = ()
+
+
+# Plugins by the name they are exposed under in the request state, in the
+# order they are created. Their modules are only imported when enabled.
+PLUGINS: dict[str, PluginSpec] = {
+    "api_bleak_scanner": PluginSpec(".api_bleak_scanner", "ApiBleakScanner"),
+    "victron_scanner": PluginSpec(
+        ".victron_scanner", "VictronScanner", requires=("api_bleak_scanner",)
+    ),
+    "bthome_scanner": PluginSpec(
+        ".bthome_scanner", "BTHomeScanner", requires=("api_bleak_scanner",)
+    ),
+    "hymer_serial": PluginSpec(".hymer_serial", "HymerSerial"),
+    "questdb_uploader": PluginSpec(".questdb_uploader", "QuestDbUploader"),
+}
+
+
+class StartupReport:
+    """
+    Import and init time per startup component.
+
+    Import time is charged to the first component importing a module, so a
+    dependency shared by several plugins shows up under the first of them.
+    """
+
+    def __init__(self):
+        self.components: dict[str, dict[str, float]] = {}
+        self.total = 0.0
+
+    def add(self, component: str, phase: str, seconds: float) -> None:
+        phases = self.components.setdefault(component, {})
+        phases[phase] = phases.get(phase, 0.0) + seconds
+        self.total += seconds
+
+    @contextmanager
+    def measure(self, component: str, phase: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(component, phase, time.perf_counter() - started)
+
+    def as_dict(self) -> dict:
+        return {
+            "total": round(self.total, 4),
+            "components": {
+                component: {phase: round(s, 4) for phase, s in phases.items()}
+                for component, phases in self.components.items()
+            },
+        }
+
+    def log(self) -> None:
+        parts = ", ".join(
+            f"{component} " + "/".join(f"{p} {s:.2f}s" for p, s in phases.items())
+            for component, phases in self.components.items()
+        )
+        logger.info(f"Started in {self.total:.2f}s: {parts}")
+
+
+def resolve(enabled: list[str]) -> list[str]:
+    """Enabled plugins and the plugins they require, in creation order."""
+    unknown = set(enabled) - PLUGINS.keys()
+    if unknown:
+        raise ValueError(f"Unknown plugins {sorted(unknown)}")
+
+    wanted = set()
+    pending = list(enabled)
+    while pending:
+        name = pending.pop()
+        if name not in wanted:
+            wanted.add(name)
+            pending.extend(PLUGINS[name].requires)
+    return [name for name in PLUGINS if name in wanted]
+
+
+def load_plugins(enabled: list[str], report: StartupReport) -> dict[str, object]:
+    """Import and create the enabled plugins, timing both in `report`."""
+    plugins = {}
+    for name in resolve(enabled):
+        spec = PLUGINS[name]
+        module_name = f"{__package__}{spec.module}"
+        if module_name in sys.modules:
+            module = sys.modules[module_name]
+        else:
+            with report.measure(name, "import"):
+                module = importlib.import_module(module_name)
+        with report.measure(name, "init"):
+            plugins[name] = getattr(module, spec.class_name)()
+    return plugins
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import os
+
+import serial
+
+logger = logging.getLogger("uvicorn.camper-api.serial_transport")
+
+
+class SerialTransport(asyncio.Transport):
+    """
+    Non-blocking asyncio transport over an open pyserial port (POSIX only).
+
+    The port's file descriptor is watched by the event loop: incoming bytes
+    go straight to `protocol.data_received`, writes that do not complete are
+    buffered and flushed when the fd is writable. The protocol is paused
+    while the write buffer is above the high water mark.
+    """
+
+    def __init__(
+        self,
+        loop: asyncio.AbstractEventLoop,
+        protocol: asyncio.Protocol,
+        serial_instance: serial.Serial,
+    ):
+        super().__init__()
+        self._loop = loop
+        self._protocol = protocol
+        self._serial = serial_instance
+        self._serial.nonblocking()
+        self._fd = serial_instance.fileno()
+        self._write_buffer = bytearray()
+        self._closing = False
+        self._closed = False
+        self._reading = True
+        self._protocol_paused = False
+        self._high_water = 4096
+        self._low_water = 1024
+
+        self._loop.call_soon(self._protocol.connection_made, self)
+        self._loop.call_soon(self._loop.add_reader, self._fd, self._read_ready)
+
+    @property
+    def serial(self) -> serial.Serial:
+        return self._serial
+
+    def _read_ready(self) -> None:
+        try:
+            data = os.read(self._fd, 1024)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as ex:
+            self._fatal_error(ex)
+            return
+        if not data:
+            self._fatal_error(EOFError("serial port closed"))
+            return
+        self._protocol.data_received(data)
+
+    def write(self, data: bytes) -> None:
+        if self._closing:
+            raise RuntimeError("write on closing serial transport")
+        if not data:
+            return
+
+        if not self._write_buffer:
+            try:
+                n = os.write(self._fd, data)
+            except (BlockingIOError, InterruptedError):
+                n = 0
+            except OSError as ex:
+                self._fatal_error(ex)
+                return
+            data = data[n:]
+            if not data:
+                return
+            self._loop.add_writer(self._fd, self._write_ready)
+
+        self._write_buffer += data
+        self._maybe_pause_protocol()
+
+    def _write_ready(self) -> None:
+        try:
+            n = os.write(self._fd, self._write_buffer)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as ex:
+            self._fatal_error(ex)
+            return
+
+        del self._write_buffer[:n]
+        self._maybe_resume_protocol()
+        if not self._write_buffer:
+            self._loop.remove_writer(self._fd)
+            if self._closing:
+                self._call_connection_lost(None)
+
+    def _maybe_pause_protocol(self) -> None:
+        if not self._protocol_paused and len(self._write_buffer) > self._high_water:
+            self._protocol_paused = True
+            self._protocol.pause_writing()
+
+    def _maybe_resume_protocol(self) -> None:
+        if self._protocol_paused and len(self._write_buffer) <= self._low_water:
+            self._protocol_paused = False
+            self._protocol.resume_writing()
+
+    def get_write_buffer_size(self) -> int:
+        return len(self._write_buffer)
+
+    def get_write_buffer_limits(self) -> tuple[int, int]:
+        return self._low_water, self._high_water
+
+    def set_write_buffer_limits(self, high=None, low=None) -> None:
+        self._high_water = 4096 if high is None else high
+        self._low_water = self._high_water // 4 if low is None else low
+        self._maybe_pause_protocol()
+
+    def can_write_eof(self) -> bool:
+        return False
+
+    def is_reading(self) -> bool:
+        return self._reading
+
+    def pause_reading(self) -> None:
+        if self._reading and not self._closing:
+            self._reading = False
+            self._loop.remove_reader(self._fd)
+
+    def resume_reading(self) -> None:
+        if not self._reading and not self._closing:
+            self._reading = True
+            self._loop.add_reader(self._fd, self._read_ready)
+
+    def is_closing(self) -> bool:
+        return self._closing
+
+    def close(self) -> None:
+        """Stop reading and close the port once the write buffer is flushed."""
+        if self._closing:
+            return
+        self._closing = True
+        self._loop.remove_reader(self._fd)
+        if not self._write_buffer:
+            self._loop.call_soon(self._call_connection_lost, None)
+
+    def abort(self) -> None:
+        self._force_close(None)
+
+    def _fatal_error(self, exc: BaseException) -> None:
+        logger.error(f"serial transport error: {exc!r}")
+        self._force_close(exc)
+
+    def _force_close(self, exc: BaseException | None) -> None:
+        if self._closed:
+            return
+        self._write_buffer.clear()
+        self._loop.remove_writer(self._fd)
+        if not self._closing:
+            self._closing = True
+            self._loop.remove_reader(self._fd)
+        self._loop.call_soon(self._call_connection_lost, exc)
+
+    def _call_connection_lost(self, exc: BaseException | None) -> None:
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._protocol.connection_lost(exc)
+        finally:
+            try:
+                self._serial.close()
+            except Exception:
+                pass
@@ -1,84 +1,168 @@
 from victron_ble.exceptions import AdvertisementKeyMissingError, UnknownDeviceError
-from victron_ble.devices import Device, detect_device_type
+from victron_ble.devices import Device, DeviceData, detect_device_type
 from bleak.backends.device import BLEDevice
 from bleak.backends.scanner import AdvertisementData
-import inspect
 from enum import Enum
-import asyncio
-from typing import Set
+from functools import lru_cache
+import time
+from typing import Callable, get_args, get_type_hints
 import logging
 
 from ..config import settings
 from ..database import get_db
 from .. import crud, schemas
+from ..scheduler import entity_sampler
+from .advert_dedup import AdvertDedup
+from .api_bleak_scanner import ApiBleakScanner
 
 logger = logging.getLogger("uvicorn.camper-api.victron_scanner")
 logger.setLevel(logging.WARNING)
 
+VICTRON_MANUFACTURER_ID = 0x02E1
 
-def parse_object_dict(obj):
-    data = {}
-    for name, method in inspect.getmembers(obj, predicate=inspect.ismethod):
-        if name.startswith("get_"):
-            value = method()
-            if isinstance(value, Enum):
-                value = value.name.lower()
-            if value is not None:
-                data[name[4:]] = value
-    return data
+
+Extractor = tuple[tuple[str, Callable[[DeviceData], object]], ...]
+
+
+def _may_return_enum(getter) -> bool:
+    try:
+        returns = get_type_hints(getter).get("return")
+    except Exception:
+        return True
+    if returns is None:
+        return True
+    return any(
+        isinstance(t, type) and issubclass(t, Enum)
+        for t in (returns, *get_args(returns))
+    )
+
+
+def _enum_name(getter):
+    def get(data: DeviceData):
+        value = getter(data)
+        return value.name.lower() if isinstance(value, Enum) else value
+
+    return get
+
+
+@lru_cache(maxsize=None)
+def build_extractor(data_type: type[DeviceData], names: tuple[str, ...]) -> Extractor:
+    """
+    Getters of `data_type` for the entity `names`, built once per class and
+    entity set. Getters annotated to return an Enum are wrapped to return the
+    lower-cased member name; names without a getter are left out.
+    """
+    extractor = []
+    for name in names:
+        getter = getattr(data_type, f"get_{name}", None)
+        if getter is None:
+            if name != "rssi":
+                logger.info(f"{data_type.__name__} has no entity {name}")
+            continue
+        if _may_return_enum(getter):
+            getter = _enum_name(getter)
+        extractor.append((name, getter))
+    return tuple(extractor)
 
 
 class VictronScanner:
     def __init__(self):
-        self._seen_data: Set[bytes] = set()
+        self._dedup = AdvertDedup(settings.ble_dedup_depth, settings.ble_dedup_max_age)
         self._devices = {}
         self._known_devices: dict[str, Device] = {}
         self._latest_entity_data = {}
+        self._latest_raw: dict[str, bytes] = {}
+        self._latest_rssi: dict[str, int] = {}
+        self._router: ApiBleakScanner | None = None
         self._db = next(get_db())
 
-        for sensor_name, sensor_details in settings.victron_sensors.items():
-            sensor = crud.get_sensor_by_name(self._db, sensor_name)
-            if sensor is None:
-                sensor = crud.create_sensor(
-                    self._db,
+        sensors = crud.provision_sensors(
+            self._db,
+            {
+                sensor_name: (
                     schemas.SensorCreate(
                         name=sensor_name,
                         address=sensor_details["address"].lower(),
                         key=sensor_details["key"],
                     ),
+                    settings.victron_entities[sensor_name],
                 )
-
+                for sensor_name, sensor_details in settings.victron_sensors.items()
+            },
+        )
+        for sensor in sensors.values():
             self._devices[sensor.address.lower()] = {
                 "key": sensor.key,
-                "entities": {},
+                "entities": sensor.entities,
+                "extractor": None,
             }
 
-            entities = crud.get_entities_by_sensor(self._db, sensor.id)
-            self._devices[sensor.address.lower()]["entities"] = {
-                e.name: e.id for e in entities
-            }
+    def register(self, router: ApiBleakScanner) -> None:
+        """Route advertisements of the configured devices to this scanner."""
+        self._router = router
+        for address in self._devices:
+            self._add_route(address)
 
-            for entity_name in settings.victron_entities[sensor.name]:
-                if (
-                    entity_name
-                    not in self._devices[sensor.address.lower()]["entities"].keys()
-                ):
-                    entity = crud.create_entity(
-                        self._db, schemas.EntityCreate(name=entity_name), sensor.id
-                    )
-                    self._devices[sensor.address.lower()]["entities"][entity_name] = (
-                        entity.id
-                    )
+    def _add_route(self, address: str) -> None:
+        if self._router is not None:
+            self._router.remove_route(address, self.detection_callback)
+            self._router.add_route(
+                address,
+                self.detection_callback,
+                "victron_scanner",
+                manufacturer_id=VICTRON_MANUFACTURER_ID,
+            )
 
-    def get_device(self, ble_device: BLEDevice, raw_data: bytes) -> Device:
-        address = ble_device.address.lower()
+    # Sensors without an address (or without a key to decrypt with) are not
+    # Victron devices; the methods below ignore them.
+
+    def add_device(
+        self, address: str | None, key: str | None, entities: dict[str, int]
+    ) -> None:
+        if address is None or key is None:
+            return
+        self._devices[address.lower()] = {
+            "key": key,
+            "entities": dict(entities),
+            "extractor": None,
+        }
+        self._add_route(address)
+
+    def remove_device(self, address: str | None) -> None:
+        if address is None:
+            return
+        if self._router is not None:
+            self._router.remove_route(address, self.detection_callback)
+        self._devices.pop(address.lower(), None)
+        self._known_devices.pop(address.lower(), None)
+        self._latest_raw.pop(address.lower(), None)
+        self._latest_rssi.pop(address.lower(), None)
+        self._dedup.forget(address.lower())
+
+    def add_entity(self, address: str | None, name: str, entity_id: int) -> None:
+        if address is None:
+            return
+        device = self._devices.get(address.lower())
+        if device is not None:
+            device["entities"][name] = entity_id
+            device["extractor"] = None
+
+    def remove_entity(self, address: str | None, name: str) -> None:
+        if address is None:
+            return
+        device = self._devices.get(address.lower())
+        if device is not None:
+            device["entities"].pop(name, None)
+            device["extractor"] = None
+
+    def get_device(self, address: str, raw_data: bytes) -> Device:
         if address not in self._known_devices:
             advertisement_key = self.load_key(address)
 
             device_klass = detect_device_type(raw_data)
             if not device_klass:
                 raise UnknownDeviceError(
-                    f"Could not identify device type for {ble_device}"
+                    f"Could not identify device type for {address}"
                 )
 
             self._known_devices[address] = device_klass(advertisement_key)
@@ -94,48 +178,89 @@ class VictronScanner:
     def detection_callback(
         self, ble_device: BLEDevice, advertisement: AdvertisementData
     ):
-        raw_data = advertisement.manufacturer_data.get(0x02E1)
-        if (
-            not raw_data
-            or not raw_data.startswith(b"\x10")
-            or raw_data in self._seen_data
-        ):
+        raw_data = advertisement.manufacturer_data.get(VICTRON_MANUFACTURER_ID)
+        if not raw_data or not raw_data.startswith(b"\x10"):
             return
 
-        # De-duplicate advertisements
-        if len(self._seen_data) > 1000:
-            self._seen_data = set()
-        self._seen_data.add(raw_data)
-
-        try:
-            device = self.get_device(ble_device, raw_data)
-        except AdvertisementKeyMissingError:
-            return
-        except UnknownDeviceError as e:
-            logger.error(f"Unknown device {str(e)}")
+        address = ble_device.address.lower()
+        if address not in self._devices or self._dedup.is_duplicate(address, raw_data):
             return
 
-        parsed = device.parse(raw_data)
-        data_dict = parse_object_dict(parsed)
-
-        for name, entity_id in self._devices[ble_device.address.lower()][
-            "entities"
-        ].items():
-            if name == "rssi":
-                self._latest_entity_data[entity_id] = ble_device.rssi
-            elif name in data_dict:
-                self._latest_entity_data[entity_id] = data_dict[name]
-            else:
-                logger.info(
-                    f"Entity {name} not found in data for device {ble_device.address.lower()} at this time."
-                )
+        # Only keep the newest payload; it is decrypted when sampled.
+        self._latest_raw[address] = raw_data
+        self._latest_rssi[address] = advertisement.rssi
+
+    def decode_latest(self, address: str | None = None) -> None:
+        """
+        Decrypt and parse the newest advertisement of `address`, or of every
+        device, into the latest entity data.
+        """
+        addresses = list(self._latest_raw) if address is None else [address]
+        for address in addresses:
+            raw_data = self._latest_raw.pop(address, None)
+            if raw_data is None:
+                continue
+            rssi = self._latest_rssi.pop(address, None)
+
+            try:
+                device = self.get_device(address, raw_data)
+                parsed = device.parse(raw_data)
+            except AdvertisementKeyMissingError:
+                continue
+            except UnknownDeviceError as e:
+                logger.error(f"Unknown device {str(e)}")
+                continue
+            except Exception as ex:
+                logger.error(f"Could not decode advertisement of {address}: {ex!r}")
+                continue
+
+            device_info = self._devices[address]
+            entities = device_info["entities"]
+            extractor = device_info["extractor"]
+            if extractor is None:
+                extractor = build_extractor(type(parsed), tuple(entities))
+                device_info["extractor"] = extractor
 
-    async def process_task(self):
-        while 1:
-            entity_data = self._latest_entity_data.copy()
-            self._latest_entity_data = {}
+            for name, getter in extractor:
+                value = getter(parsed)
+                if value is not None:
+                    self._latest_entity_data[entities[name]] = value
+                else:
+                    logger.info(
+                        f"Entity {name} not found in data for device {address} at this time."
+                    )
+            if "rssi" in entities:
+                self._latest_entity_data[entities["rssi"]] = rssi
+
+    async def refresh(self, address: str) -> None:
+        """Decode the newest advertisement of `address` now and cache its states."""
+        address = address.lower()
+        self.decode_latest(address)
+
+        device_info = self._devices.get(address)
+        if device_info is None:
+            return
+        states = {
+            entity_id: str(self._latest_entity_data.pop(entity_id))
+            for entity_id in device_info["entities"].values()
+            if entity_id in self._latest_entity_data
+        }
+        if states:
+            await crud.create_states(self._db, states)
 
-            for entity_id, entity_state in entity_data.items():
-                await crud.create_state(self._db, entity_id, str(entity_state))
+    async def sample(self):
+        """Decode and store the entities that are due for a sample."""
+        now = time.monotonic()
+        for address, device_info in self._devices.items():
+            if any(
+                entity_sampler.due(e, now) for e in device_info["entities"].values()
+            ):
+                self.decode_latest(address)
 
-            await asyncio.sleep(settings.state_monitor_sample_interval)
+        states = {}
+        for entity_id in list(self._latest_entity_data):
+            if entity_sampler.due(entity_id, now):
+                states[entity_id] = str(self._latest_entity_data.pop(entity_id))
+                entity_sampler.mark(entity_id, now)
+        if states:
+            await crud.create_states(self._db, states)
@@ -0,0 +1,178 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from .config import settings
+
+MIN_INTERVAL = 0.001  # seconds
+PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_running = threading.Lock()
+
+
+def _short_path(filename: str) -> str:
+    if filename.startswith(PACKAGE_PARENT):
+        return os.path.relpath(filename, PACKAGE_PARENT)
+    _, sep, tail = filename.rpartition("site-packages/")
+    if sep:
+        return tail
+    return os.path.basename(filename)
+
+
+class StackSampler:
+    """
+    Sampling profiler over every thread of the process.
+
+    A sampler thread reads the stacks of all other threads with
+    sys._current_frames() every `interval` seconds and counts them per
+    function. Nothing is hooked into the profiled code, so its cost is the
+    sampler's own CPU time; the interval is stretched whenever that would
+    exceed `max_overhead` of a core. `stop()` ends a run early.
+    """
+
+    def __init__(self, interval: float, max_overhead: float):
+        self.interval = max(interval, MIN_INTERVAL)
+        self.max_overhead = max_overhead
+        self.stacks: Counter[tuple[str, ...]] = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        self.sampler_cpu = 0.0
+        self._labels: dict = {}
+        self._stopping = threading.Event()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = _short_path(code.co_filename)
+            label = f"{code.co_name} ({path}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    def run(self, duration: float) -> None:
+        own = threading.get_ident()
+        started = time.perf_counter()
+        deadline = started + duration
+        while True:
+            cpu = time.thread_time()
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                stack.reverse()
+                self.stacks[tuple(stack)] += 1
+            self.samples += 1
+            cost = time.thread_time() - cpu
+            self.sampler_cpu += cost
+
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            delay = min(max(self.interval, cost / self.max_overhead), remaining)
+            if self._stopping.wait(delay):
+                break
+        self.elapsed = time.perf_counter() - started
+
+    def collapsed(self) -> str:
+        """One `thread;outer;...;inner count` line per stack, for flame graphs."""
+        return "".join(
+            f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common()
+        )
+
+    def summary(self, top: int = 25) -> dict:
+        """
+        Samples per thread name with the `top` functions by own samples (on
+        top of the stack) and total samples (anywhere in the stack).
+        """
+        threads: Counter[str] = Counter()
+        own: Counter[tuple[str, str]] = Counter()
+        total: Counter[tuple[str, str]] = Counter()
+        for stack, count in self.stacks.items():
+            thread = stack[0]
+            threads[thread] += count
+            if len(stack) > 1:
+                own[thread, stack[-1]] += count
+            for function in set(stack[1:]):
+                total[thread, function] += count
+
+        def ranked(counter: Counter, thread: str) -> list[dict]:
+            rows = sorted(
+                (
+                    (count, function)
+                    for (t, function), count in counter.items()
+                    if t == thread
+                ),
+                reverse=True,
+            )
+            return [
+                {
+                    "function": function,
+                    "samples": count,
+                    "percent": round(100 * count / threads[thread], 1),
+                }
+                for count, function in rows[:top]
+            ]
+
+        return {
+            "duration": round(self.elapsed, 3),
+            "samples": self.samples,
+            "interval": round(self.elapsed / max(self.samples, 1), 4),
+            "overhead": round(self.sampler_cpu / max(self.elapsed, 1e-9), 4),
+            "threads": {
+                thread: {
+                    "samples": count,
+                    "own": ranked(own, thread),
+                    "total": ranked(total, thread),
+                }
+                for thread, count in threads.most_common()
+            },
+        }
+
+
+async def profile(duration: float, interval: float) -> StackSampler:
+    """
+    Sample the running service for `duration` seconds, capped by
+    settings.profile_max_duration. Raises RuntimeError while another
+    profile is running.
+
+    The sampler runs in its own daemon thread, which holds the lock until it
+    has finished; cancelling the caller stops it early.
+    """
+    if not _running.acquire(blocking=False):
+        raise RuntimeError("A profile is already running")
+
+    loop = asyncio.get_running_loop()
+    done = loop.create_future()
+    sampler = StackSampler(interval, settings.profile_max_overhead)
+
+    def finished() -> None:
+        if not done.done():
+            done.set_result(None)
+
+    def sample() -> None:
+        try:
+            sampler.run(min(duration, settings.profile_max_duration))
+        finally:
+            _running.release()
+            try:
+                loop.call_soon_threadsafe(finished)
+            except RuntimeError:
+                pass  # loop closed
+
+    threading.Thread(target=sample, name="profiler", daemon=True).start()
+    try:
+        await done
+    except asyncio.CancelledError:
+        sampler.stop()
+        raise
+    return sampler
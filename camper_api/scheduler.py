@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable
+
+from .config import settings
+from .metrics import REGISTRY, Histogram
+
+logger = logging.getLogger("uvicorn.camper-api.scheduler")
+
+JOB_RUN_BUCKETS = (0.001, 0.01, 0.1, 0.5, 1.0, 5.0, 30.0, 60.0, 300.0)
+
+_job_run_time = REGISTRY.histogram(
+    "camper_job_run_seconds",
+    "Run time of the periodic jobs",
+    ("job",),
+    buckets=JOB_RUN_BUCKETS,
+)
+_job_runs = REGISTRY.counter(
+    "camper_job_runs_total", "Runs of the periodic jobs, by result", ("job", "result")
+)
+
+
+@dataclass
+class Job:
+    name: str
+    fn: Callable[[], Awaitable[None]]
+    interval: float
+    jitter: float = 0.0
+    initial_delay: float = 0.0
+    align: bool = True
+
+    runs: int = 0
+    failures: int = 0
+    restarts: int = 0
+    overruns: int = 0
+    running: bool = False
+    last_started: float | None = None
+    last_duration: float | None = None
+    last_error: str | None = None
+    next_run: float | None = None
+    run_time: Histogram = field(init=False)
+    _tick: float | None = field(default=None, init=False, repr=False)
+
+    def __post_init__(self):
+        self.run_time = _job_run_time.labels(self.name)
+
+    def schedule_next(self, now: float) -> float:
+        """
+        Wall-clock time of the next run. Aligned jobs tick on multiples of
+        their interval, others run right away and then keep a fixed rate;
+        ticks that already passed are skipped. Jitter is added to each run
+        but never carried over into the next tick.
+        """
+        if self.align:
+            tick = (math.floor(now / self.interval) + 1) * self.interval
+        elif self._tick is None:
+            tick = now
+        else:
+            tick = self._tick + self.interval
+            if tick <= now:
+                tick += math.ceil((now - tick) / self.interval) * self.interval
+        self._tick = tick
+        self.next_run = tick + random.uniform(0, self.jitter)
+        return self.next_run
+
+    def stats(self) -> dict:
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "restarts": self.restarts,
+            "overruns": self.overruns,
+            "running": self.running,
+            "last_started": (
+                datetime.fromtimestamp(self.last_started).isoformat()
+                if self.last_started
+                else None
+            ),
+            "last_duration": self.last_duration,
+            "last_error": self.last_error,
+            "next_run": (
+                datetime.fromtimestamp(self.next_run).isoformat()
+                if self.next_run
+                else None
+            ),
+            "run_time": self.run_time.snapshot(),
+        }
+
+
+class Scheduler:
+    """
+    Runs the periodic jobs of the API and its plugins.
+
+    A failing run is logged and counted; the job simply runs again at its
+    next tick. Should a job's runner task die anyway, it is restarted after
+    `restart_delay` seconds.
+    """
+
+    def __init__(self, restart_delay: float = 5.0):
+        self.restart_delay = restart_delay
+        self._jobs: dict[str, Job] = {}
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._started = False
+        self._stopping = False
+
+    def add_job(
+        self,
+        name: str,
+        fn: Callable[[], Awaitable[None]],
+        interval: float,
+        jitter: float = 0.0,
+        initial_delay: float = 0.0,
+        align: bool = True,
+    ) -> Job:
+        job = Job(name, fn, interval, jitter, initial_delay, align)
+        self._jobs[name] = job
+        if self._started:
+            self._spawn(job)
+        return job
+
+    async def start(self) -> None:
+        self._started = True
+        REGISTRY.add_collector(self._collect_metrics)
+        for job in self._jobs.values():
+            self._spawn(job)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        REGISTRY.remove_collector(self._collect_metrics)
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def run_now(self, name: str) -> None:
+        """Run a job immediately, outside its schedule."""
+        await self._run_once(self._jobs[name])
+
+    def stats(self) -> dict:
+        return {name: job.stats() for name, job in self._jobs.items()}
+
+    def _collect_metrics(self) -> None:
+        for job in self._jobs.values():
+            _job_runs.labels(job.name, "ok").set(job.runs - job.failures)
+            _job_runs.labels(job.name, "failed").set(job.failures)
+
+    def _spawn(self, job: Job) -> None:
+        task = asyncio.create_task(self._run_job(job), name=f"job:{job.name}")
+        task.add_done_callback(lambda t: self._job_done(job, t))
+        self._tasks[job.name] = task
+
+    def _job_done(self, job: Job, task: asyncio.Task) -> None:
+        if self._stopping or task.cancelled():
+            return
+        logger.error(
+            f"job {job.name} stopped: {task.exception()!r}; "
+            f"restarting in {self.restart_delay}s"
+        )
+        job.restarts += 1
+        job.initial_delay = self.restart_delay
+        self._spawn(job)
+
+    async def _run_job(self, job: Job) -> None:
+        if job.initial_delay:
+            await asyncio.sleep(job.initial_delay)
+        while True:
+            await asyncio.sleep(max(job.schedule_next(time.time()) - time.time(), 0))
+            await self._run_once(job)
+
+    async def _run_once(self, job: Job) -> None:
+        job.running = True
+        job.last_started = time.time()
+        started = time.perf_counter()
+        try:
+            await job.fn()
+        except Exception as ex:
+            job.failures += 1
+            job.last_error = repr(ex)
+            logger.error(f"job {job.name} failed", exc_info=True)
+        finally:
+            job.running = False
+            job.runs += 1
+            job.last_duration = time.perf_counter() - started
+            job.run_time.observe(job.last_duration)
+            if job.last_duration > job.interval:
+                job.overruns += 1
+
+
+class EntitySampler:
+    """
+    Per-entity sample intervals on top of a sampler job's tick.
+
+    Entities sample at `default_interval` unless given their own interval.
+    While watched, an entity samples every tick instead; a watch decays
+    after its hold time unless renewed. A sample counts as due up to half a
+    tick early, so an interval that is a multiple of the tick does not slip
+    by a whole tick.
+    """
+
+    def __init__(self, default_interval: float, tick: float):
+        self.default_interval = default_interval
+        self.tick = tick
+        self._intervals: dict[int, float] = {}
+        self._last_sampled: dict[int, float] = {}
+        self._watched_until: dict[int, float] = {}
+
+    def set_interval(self, entity_id: int, interval: float | None) -> None:
+        if interval is None:
+            self._intervals.pop(entity_id, None)
+        else:
+            self._intervals[entity_id] = interval
+
+    def watch(self, entity_ids, hold: float) -> None:
+        """Sample `entity_ids` every tick for the next `hold` seconds."""
+        until = time.monotonic() + hold
+        for entity_id in entity_ids:
+            self._watched_until[entity_id] = until
+
+    def interval(self, entity_id: int, now: float | None = None) -> float:
+        until = self._watched_until.get(entity_id)
+        if until is not None:
+            if until > (time.monotonic() if now is None else now):
+                return self.tick
+            del self._watched_until[entity_id]
+        return self._intervals.get(entity_id, self.default_interval)
+
+    def due(self, entity_id: int, now: float) -> bool:
+        last = self._last_sampled.get(entity_id)
+        return (
+            last is None or now - last >= self.interval(entity_id, now) - self.tick / 2
+        )
+
+    def mark(self, entity_id: int, now: float) -> None:
+        self._last_sampled[entity_id] = now
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        return {
+            "monitor_interval": self.default_interval,
+            "responsive_interval": self.tick,
+            "watched": sorted(
+                entity_id
+                for entity_id, until in list(self._watched_until.items())
+                if until > now
+            ),
+        }
+
+
+entity_sampler = EntitySampler(
+    settings.state_monitor_sample_interval, settings.state_responsive_sample_interval
+)
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional
 
@@ -64,3 +64,15 @@ class State(StateBase):
 class ActionData(BaseModel):
     key: str
     value: int | str
+
+
+class EntityName(BaseModel):
+    sensor: str
+    entity: str
+
+
+class GroupedStatesQuery(BaseModel):
+    entities: list[EntityName] = Field(min_length=1)
+    period: str = "4h"
+    samples: int = 100
+    intervals: bool = False
@@ -0,0 +1,90 @@
+import asyncio
+from threading import Event, Lock
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.done = Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """
+    Let concurrent identical calls share one computation.
+
+    Thread based, for the synchronous endpoints FastAPI runs in its
+    threadpool. The first caller for a key runs `fn`; callers arriving while
+    it is in flight wait for and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        with self._lock:
+            self.calls += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+            return call.result
+        except BaseException as ex:
+            call.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }
+
+
+class AsyncSingleFlight:
+    """Asyncio variant of SingleFlight for coroutines on the event loop."""
+
+    def __init__(self):
+        self._calls: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable], *args, **kwargs):
+        self.calls += 1
+        fut = self._calls.get(key)
+        if fut is not None:
+            self.coalesced += 1
+        else:
+            fut = asyncio.ensure_future(fn(*args, **kwargs))
+            self._calls[key] = fut
+            fut.add_done_callback(lambda _: self._calls.pop(key, None))
+
+        # Shield so a cancelled waiter does not cancel the shared call.
+        return await asyncio.shield(fut)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._calls),
+        }